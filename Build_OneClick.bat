@@ -65,6 +65,20 @@ echo [4/6] Building EXE...
   --hidden-import Tools.botTools ^
   --hidden-import Tools.winTools ^
   --hidden-import Tools.avMethods ^
+  --hidden-import Tools.templateCache ^
+  --hidden-import Tools.visionTools ^
+  --hidden-import Tools.captureTools ^
+  --hidden-import Tools.learnedRegions ^
+  --hidden-import Tools.pixelTools ^
+  --hidden-import Tools.frameProducer ^
+  --hidden-import Tools.waitTools ^
+  --hidden-import Tools.ocrTools ^
+  --hidden-import Tools.glyphTools ^
+  --hidden-import Tools.waveTracker ^
+  --hidden-import Tools.economyTools ^
+  --hidden-import Tools.inputTools ^
+  --hidden-import Tools.pathTools ^
+  --hidden-import Tools.stateMachine ^
   --hidden-import numpy ^
   --hidden-import cv2 ^
   --hidden-import pytesseract ^
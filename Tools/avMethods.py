@@ -3,17 +3,12 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # needed to get py tools
 from Tools import botTools as bt
-from Tools import winTools as wt
 # Inputs
 import time
 
 # Text Detection 
-import cv2
-import pytesseract
-
-pytesseract.pytesseract.tesseract_cmd = os.path.join( # ocr
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tesseract", "tesseract.exe"
-)
+from Tools import ocrTools as ocr # in process tesseract, loaded once
+from Tools import glyphTools as glyph # wave digits without tesseract
 
 os.environ["TESSDATA_PREFIX"] = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tesseract", "tessdata"
@@ -30,12 +25,10 @@ def get_wave(new_region: tuple[int, int, int, int] | None = None) -> int: # Gets
         regionArea = (x,y,w,h)
         if new_region is not None:
             regionArea=new_region
-        screenshot = wt.screenshot_region(region=regionArea) # Get image of num
-    
-        gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY) # Grayscale for speed
-        _, threshold = cv2.threshold(gray, 230, 255, cv2.THRESH_BINARY) # Threshold so only the num is there
-        thresh = cv2.resize(threshold, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC) # resize for accuracy
-        wave = pytesseract.image_to_string(thresh, config='--psm 7 -c tessedit_char_whitelist=0123456789') # Number detector [0,9] no char
+        pre = ocr.preprocessor(regionArea) # grab, gray, threshold 230 and 2x resize into reused buffers
+        with pre.lock: # tracker thread and main thread can both read the wave
+            thresh = pre.process()
+            wave = glyph.read_digits(thresh) # Tesseract, or the glyph match first once the glyph set has every digit
         if not wave.strip():
             return -1
         return int(wave) # Returns the wave that was found
@@ -49,18 +42,65 @@ def read_region(region: tuple[int, int, int, int] | None = None) -> int: # Gets
     try:
         
         regionArea = region
-        screenshot = wt.screenshot_region(region=regionArea) # Get image of num
-    
-        gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY) # Grayscale for speed
-        _, threshold = cv2.threshold(gray, 230, 255, cv2.THRESH_BINARY) # Threshold 
-        thresh = cv2.resize(threshold, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC) # resize for accuracy
-        text = pytesseract.image_to_string(thresh, config='--psm 7 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ') 
+        pre = ocr.preprocessor(regionArea)
+        with pre.lock:
+            thresh = pre.process()
+            text = ocr.read(thresh, whitelist=ocr.LETTERS) 
         if not text.strip():
             return text
         return text 
         
     except Exception as e:
         print(f"Error in get_wave: {e}")
+YEN_CHARS = "0123456789,.KMkm"
+
+def parse_yen(text: str) -> int:
+    '''
+    "12,345" -> 12345, "1.5K" -> 1500, -1 if it isn't a number
+    '''
+    text = text.strip().replace(",", "").replace(" ", "").upper()
+    multiplier = 1
+    if text.endswith("K"):
+        multiplier, text = 1_000, text[:-1]
+    elif text.endswith("M"):
+        multiplier, text = 1_000_000, text[:-1]
+    try:
+        return int(float(text) * multiplier)
+    except ValueError:
+        return -1
+
+def get_yen(region: tuple[int, int, int, int] | None = None) -> int:
+    '''
+    Reads the yen counter, region: (x1,y1,x2,y2) of the counter (YEN_REGION in the settings).
+    Plain numbers go through the glyph match (if enabled), anything else (K/M suffix, ...) through tesseract.
+    Returns -1 if it couldn't be read.
+    '''
+    if region is None:
+        return -1
+    try:
+        pre = ocr.preprocessor(tuple(region))
+        with pre.lock:
+            thresh = pre.process()
+            text, confidence = glyph.recognize(thresh) if glyph.usable() else ("", 0.0) # commas are too small to count as digits
+            if not text or confidence < glyph.MIN_CONFIDENCE:
+                text = ocr.read(thresh, whitelist=YEN_CHARS)
+        return parse_yen(text)
+    except Exception as e:
+        print(f"Error in get_yen: {e}")
+        return -1
+def read_numbers(regions: dict[str, tuple[int, int, int, int]]) -> dict[str, int]:
+    '''
+    Reads several counters at once, regions: {name: (x1,y1,x2,y2)}
+    Returns {name: number}, -1 for the ones that couldn't be read
+    '''
+    numbers = {name: -1 for name in regions}
+    try:
+        for name, text in ocr.read_many(regions, whitelist=ocr.DIGITS).items():
+            if text.isdigit():
+                numbers[name] = int(text)
+    except Exception as e:
+        print(f"Error in read_numbers: {e}")
+    return numbers
 def restart_match():
     '''sybau'''
     #(227, 868), (1150, 454), (681, 565), (726, 570), (1212, 264)
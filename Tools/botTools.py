@@ -4,19 +4,64 @@ from pyautogui import *
 import time
 import pyautogui
 import ctypes
+from collections import deque
+from Tools import templateCache as tc
+from Tools import visionTools as vt
+from Tools import learnedRegions as lr
+from Tools import frameProducer as fp
+from Tools import pixelTools as pt
+from Tools import inputTools as inp
+from Tools import waitTools as wait
 
-def does_exist(imageDirectory: str, confidence: float, grayscale: bool, region: tuple | None=None) -> bool:
+pyautogui.PAUSE = 0 # no hidden sleep after every pyautogui call, delays go through inputTools (pause/pace)
+
+tc.load_all() # Decode every template once instead of on every locate call
+
+def grab_frame(region: tuple | None=None, max_age: float | None=None, since: float | None=None) -> vt.Frame:
+    '''
+    Takes one screenshot that can be passed as frame= to several checks
+    Region: (x,y,width,height), None for the whole screen
+    max_age: reuse the background producer's frame if it's at most this many seconds old
+    since: perf_counter time of the action being checked, the producer's frame is only reused if it was taken after it
+    '''
+    if max_age is not None:
+        frame = fp.latest(max_age)
+        if frame is not None and frame.covers(region) and (since is None or frame.timestamp > since):
+            return frame
+    return vt.Frame.capture(region)
+
+def _match(frame: vt.Frame, imageDirectory: str, confidence: float, grayscale: bool, region: tuple | None, pyramid: bool, learn: bool, gate: bool = False):
+    '''
+    Searches around where the image was last seen first, then the whole region.
+    gate: reuse the last result if the crop hasn't changed (only for idle polling loops)
+    Returns (score, (x,y,width,height)) or None
+    '''
+    if learn:
+        learned = lr.search_region(imageDirectory, region)
+        if learned is not None:
+            found = frame.match(imageDirectory, grayscale, region=learned, gate=gate)
+            if found is not None and found[0] >= confidence:
+                lr.stats["learned_hits"] += 1
+                lr.remember(imageDirectory, found[1])
+                return found
+        lr.stats["fallbacks"] += 1
+    found = frame.match(imageDirectory, grayscale, region=region, pyramid=pyramid, gate=gate)
+    if found is None or found[0] < confidence:
+        return None
+    if learn:
+        lr.remember(imageDirectory, found[1])
+    return found
+
+def does_exist(imageDirectory: str, confidence: float, grayscale: bool, region: tuple | None=None, frame: vt.Frame | None=None, pyramid: bool=False, learn: bool=True, gate: bool=False) -> bool:
+    '''
+    pyramid: search a half size screenshot first then refine, for big (full window) searches
+    learn: look where the image was last found before searching the whole region
+    gate: skip matching when the region looks unchanged since last time (idle polling loops only)
+    '''
     try:
-   
-        name = imageDirectory
-        imageDirectory = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        "Resources",
-        imageDirectory)
-        if region is None:
-            check = pyautogui.locateOnScreen(imageDirectory, grayscale=grayscale, confidence=confidence)
-        else:
-            check = pyautogui.locateOnScreen(imageDirectory, grayscale=grayscale, confidence=confidence, region=region)
+        if frame is None:
+            frame = vt.Frame.capture(region)
+        check = _match(frame, imageDirectory, confidence, grayscale, region, pyramid, learn, gate)
      
         if check is not None:
             return True
@@ -24,20 +69,40 @@ def does_exist(imageDirectory: str, confidence: float, grayscale: bool, region:
     except Exception as e:
         return False
 
-def click_image(imageDirectory: str, confidence: float, grayscale: bool, offset: tuple[int,int], region: tuple| None=None) -> bool:
+def detect_any(images: list[str], confidence: float, grayscale: bool, region: tuple | None=None, stop_at_first: bool=False, frame: vt.Frame | None=None, learn: bool=True, gate: bool=False) -> dict:
+    '''
+    Checks several images against one screenshot of region.
+    Returns {image: (score, (x,y,width,height))} for every image found, empty if none were.
+    stop_at_first: stop matching once one image is found
+    gate: skip matching when the region looks unchanged since last time (idle polling loops only)
+    '''
+    try:
+        if frame is None:
+            frame = vt.Frame.capture(region)
+        found = {}
+        for image in images:
+            check = _match(frame, image, confidence, grayscale, region, False, learn, gate)
+            if check is None:
+                continue
+            found[image] = check
+            if stop_at_first:
+                break
+        return found
+    except Exception as e:
+        return {}
+
+def click_image(imageDirectory: str, confidence: float, grayscale: bool, offset: tuple[int,int], region: tuple| None=None, frame: vt.Frame | None=None, pyramid: bool=False, learn: bool=True) -> bool:
     try:
-        imageDirectory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),"Resources", imageDirectory)
-        if region is None:
-            image_location = pyautogui.locateOnScreen(imageDirectory, grayscale=grayscale, confidence=confidence)
-        else:
-            image_location = pyautogui.locateOnScreen(imageDirectory, grayscale=grayscale, confidence=confidence, region=region)
+        if frame is None:
+            frame = vt.Frame.capture(region)
+        image_location = _match(frame, imageDirectory, confidence, grayscale, region, pyramid, learn)
         if image_location is not None:
-            image_center = pyautogui.center(image_location)
+            image_center = vt.center(image_location[1])
             if offset == (0,0):
-                click(image_center.x, image_center.y)
+                click(image_center[0], image_center[1])
                 return True
             else:
-                click(image_center.x+offset[0], image_center.y+offset[1])
+                click(image_center[0]+offset[0], image_center[1]+offset[1])
                 return True
     except Exception as e:
         return False
@@ -51,8 +116,81 @@ def click(x: int,y: int, delay: int | None=None,) -> None: # Set curser position
         delay = 0.1 # Standard click delaya
     else:
         delay=delay
-    pyautogui.moveTo(x,y)
-    time.sleep(delay)
-    ctypes.windll.user32.mouse_event(0x0001, 0, 1, 0, 0)
-    pyautogui.click()
-    
\ No newline at end of file
+    inp.pace() # keeps the gap pyautogui.PAUSE used to add after the last click
+    inp.move(x,y)
+    inp.pause(delay + inp.GAP) # hover: delay plus the PAUSE pyautogui used to add after moveTo
+    inp.move_relative(0, 1) # nudge so roblox registers the hover
+    inp.click()
+    
+
+REACTION_SAMPLES = 50 # reaction times kept per name for calibrating the re-click timeout
+DEFAULT_RECLICK = 1.0 # seconds before re-clicking until enough reactions were seen
+reaction_times = {} # name -> deque of seconds from click to the UI reacting
+
+def reclick_timeout(name: str) -> float:
+    '''
+    How long to wait for the UI before clicking again: twice the 90th percentile reaction seen for name,
+    kept between 0.3 and 2 seconds, DEFAULT_RECLICK until there are 5 samples
+    '''
+    samples = sorted(reaction_times.get(name, ()))
+    if len(samples) < 5:
+        return DEFAULT_RECLICK
+    return min(max(samples[int(len(samples) * 0.9)] * 2, 0.3), 2.0)
+
+def _expectation(expect):
+    # callable, registered pixel signature name, or {"image":..., "confidence":..., "grayscale":..., "region":...}
+    if callable(expect):
+        return expect
+    if isinstance(expect, str):
+        return lambda: pt.check(expect)
+    return lambda: does_exist(expect["image"], expect.get("confidence", 0.8), expect.get("grayscale", True), region=expect.get("region"))
+
+def click_until(pos: tuple[int, int], expect, max_wait: float | None = 5.0, reclick_after: float | None = None, settle: float = 0.1,
+                button: str = "left", on_retry=None, cancel=None, name: str | None = None) -> float | None:
+    '''
+    Clicks pos and watches for expect at a high poll rate, returns as soon as it's seen.
+    expect: a function, a pixelTools signature name or a template dict (see _expectation)
+    settle: hover time between moving there and clicking (the game needs the mouse to sit for a moment)
+    reclick_after: seconds without a reaction before clicking again, None = calibrated from past reactions
+    on_retry(): runs before every re-click (close a popup, ...)
+    Returns seconds from the last click to the reaction, None if max_wait ran out or cancel() came true.
+    '''
+    name = name or str(expect)
+    condition = _expectation(expect)
+    deadline = None if max_wait is None else time.perf_counter() + max_wait
+    clicks = 0
+    while True:
+        if clicks and on_retry is not None:
+            on_retry()
+        inp.send([("move", pos[0], pos[1]), ("move_rel", 0, 1)]) # wiggle so the game sees the hover
+        time.sleep(settle)
+        inp.send([("move_rel", 0, -1), ("mouse_down", button), ("mouse_up", button)])
+        clicks += 1
+        timeout = reclick_after if reclick_after is not None else reclick_timeout(name)
+        if deadline is not None:
+            timeout = min(timeout, max(deadline - time.perf_counter(), 0))
+        try:
+            reaction = wait.wait_for(condition, timeout=timeout, poll_interval=0.01, backoff=1.2, max_interval=0.05, cancel=cancel, name=name)
+        except wait.WaitTimeout:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            continue
+        if reaction is None:
+            return None
+        reaction_times.setdefault(name, deque(maxlen=REACTION_SAMPLES)).append(reaction)
+        return reaction
+
+def get_reaction_stats() -> dict:
+    '''
+    {name: {"samples", "median", "p90", "reclick_after"}} from click_until
+    '''
+    report = {}
+    for name, samples in reaction_times.items():
+        ordered = sorted(samples)
+        report[name] = {
+            "samples": len(ordered),
+            "median": ordered[len(ordered) // 2],
+            "p90": ordered[int(len(ordered) * 0.9)],
+            "reclick_after": reclick_timeout(name),
+        }
+    return report
@@ -0,0 +1,313 @@
+import os
+import glob
+import time
+import threading
+import numpy as np
+import cv2
+
+# Screen capture backends, everything returns BGR numpy arrays for bbox (left, top, right, bottom) in screen coordinates.
+# Pick one with the LENIVAYA_CAPTURE env var: "win32", "win32:<window title>", "pil" or "replay:<folder or .npz>"
+
+class CaptureBackend:
+    name = "base"
+
+    def grab(self, bbox: tuple[int, int, int, int] | None = None, out: np.ndarray | None = None) -> np.ndarray:
+        '''
+        bbox: (left, top, right, bottom), None for the whole screen
+        out: optional preallocated (h, w, 3) uint8 array to write into
+        '''
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+class PILCapture(CaptureBackend):
+    '''
+    The old ImageGrab path, works anywhere PIL can grab the screen
+    '''
+    name = "pil"
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+
+    def grab(self, bbox=None, out=None):
+        img = self._grab(bbox=bbox)
+        return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR, dst=out)
+
+class Win32Capture(CaptureBackend):
+    '''
+    Keeps the device contexts and a DIB section alive between grabs so each grab is one BitBlt + one copy.
+    hwnd: grab relative to this window's client area (0 = whole desktop), bbox stays in screen coordinates.
+    Parts of bbox outside the window (or the screen) come back black and are reported once per bbox.
+    '''
+    name = "win32"
+    SRCCOPY = 0x00CC0020
+    CAPTUREBLT = 0x40000000
+
+    def __init__(self, hwnd: int = 0):
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        user32 = ctypes.windll.user32
+        gdi32 = ctypes.windll.gdi32
+        # Handles are pointer sized, without these ctypes truncates them to int on 64 bit
+        user32.GetDC.argtypes = [wintypes.HWND]
+        user32.GetDC.restype = wintypes.HDC
+        user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+        user32.ClientToScreen.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.POINT)]
+        user32.GetClientRect.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.RECT)]
+        gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+        gdi32.CreateCompatibleDC.restype = wintypes.HDC
+        gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.c_void_p, wintypes.UINT, ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+        gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+        gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+        gdi32.SelectObject.restype = wintypes.HGDIOBJ
+        gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+        gdi32.DeleteDC.argtypes = [wintypes.HDC]
+        gdi32.BitBlt.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, wintypes.HDC, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+        self._user32 = user32
+        self._gdi32 = gdi32
+        self.hwnd = hwnd
+        self._src_dc = user32.GetDC(hwnd or None)
+        self._mem_dc = gdi32.CreateCompatibleDC(self._src_dc)
+        self._bitmap = None
+        self._old_bitmap = None
+        self._buffer = None
+        self._size = (0, 0)
+        self._lock = threading.Lock()
+        self._reported = set() # bboxes already reported as partly off window
+
+    def _ensure_buffer(self, width: int, height: int) -> None:
+        if width <= self._size[0] and height <= self._size[1]:
+            return
+        ctypes = self._ctypes
+        wintypes = self._wintypes
+        width = max(width, self._size[0])
+        height = max(height, self._size[1])
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [
+                ("biSize", wintypes.DWORD), ("biWidth", wintypes.LONG), ("biHeight", wintypes.LONG),
+                ("biPlanes", wintypes.WORD), ("biBitCount", wintypes.WORD), ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD), ("biXPelsPerMeter", wintypes.LONG), ("biYPelsPerMeter", wintypes.LONG),
+                ("biClrUsed", wintypes.DWORD), ("biClrImportant", wintypes.DWORD),
+            ]
+        header = BITMAPINFOHEADER()
+        header.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        header.biWidth = width
+        header.biHeight = -height # negative = top down rows, same layout as numpy
+        header.biPlanes = 1
+        header.biBitCount = 32
+        header.biCompression = 0 # BI_RGB
+        bits = ctypes.c_void_p()
+        bitmap = self._gdi32.CreateDIBSection(self._mem_dc, ctypes.byref(header), 0, ctypes.byref(bits), None, 0)
+        if not bitmap or not bits.value:
+            raise OSError("CreateDIBSection failed")
+        old = self._gdi32.SelectObject(self._mem_dc, bitmap)
+        if self._bitmap is not None:
+            self._gdi32.DeleteObject(self._bitmap)
+        else:
+            self._old_bitmap = old
+        self._bitmap = bitmap
+        raw = (ctypes.c_uint8 * (width * height * 4)).from_address(bits.value)
+        self._buffer = np.ctypeslib.as_array(raw).reshape(height, width, 4) # BGRA, owned by the DIB section
+        self._size = (width, height)
+
+    def _screen_size(self) -> tuple[int, int]:
+        return (self._user32.GetSystemMetrics(0), self._user32.GetSystemMetrics(1))
+
+    def _source_size(self) -> tuple[int, int]:
+        '''
+        Size of what the source DC can see, the client area with a window, the screen without
+        '''
+        if not self.hwnd:
+            return self._screen_size()
+        rect = self._wintypes.RECT()
+        self._user32.GetClientRect(self.hwnd, self._ctypes.byref(rect))
+        return (rect.right - rect.left, rect.bottom - rect.top)
+
+    def grab(self, bbox=None, out=None):
+        if bbox is None:
+            bbox = (0, 0, *self._screen_size())
+        left, top, right, bottom = bbox
+        width, height = right - left, bottom - top
+        if self.hwnd:
+            origin = self._wintypes.POINT(0, 0)
+            self._user32.ClientToScreen(self.hwnd, self._ctypes.byref(origin))
+            left -= origin.x
+            top -= origin.y
+        # Only BitBlt the part inside the source, the rest stays black like ReplayCapture's off frame parts
+        source_w, source_h = self._source_size()
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, source_w), min(top + height, source_h)
+        if (x0, y0, x1, y1) != (left, top, left + width, top + height) and bbox not in self._reported:
+            self._reported.add(bbox)
+            print(f"Capture bbox {bbox} is partly outside the {'window' if self.hwnd else 'screen'} ({source_w}x{source_h}), off parts are black")
+        with self._lock:
+            self._ensure_buffer(width, height)
+            frame = self._buffer[:height, :width]
+            if x1 <= x0 or y1 <= y0:
+                frame[:] = 0
+            else:
+                if (x0, y0, x1, y1) != (left, top, left + width, top + height):
+                    frame[:] = 0
+                self._gdi32.BitBlt(self._mem_dc, x0 - left, y0 - top, x1 - x0, y1 - y0, self._src_dc, x0, y0, self.SRCCOPY | self.CAPTUREBLT)
+            return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=out)
+
+    def close(self):
+        with self._lock:
+            if self._bitmap is not None:
+                self._gdi32.SelectObject(self._mem_dc, self._old_bitmap)
+                self._gdi32.DeleteObject(self._bitmap)
+                self._bitmap = None
+                self._buffer = None
+                self._size = (0, 0)
+            if self._mem_dc:
+                self._gdi32.DeleteDC(self._mem_dc)
+                self._mem_dc = None
+            if self._src_dc:
+                self._user32.ReleaseDC(self.hwnd or None, self._src_dc)
+                self._src_dc = None
+
+class ReplayCapture(CaptureBackend):
+    '''
+    Serves recorded frames instead of the screen so the vision code can run without the game.
+    source: a folder of .png files (played in name order), a single .png, or a .npz made by record()
+    Frames are full screen shots, origin is where their top left was on screen.
+    auto_advance: move to the next frame after every grab, otherwise call advance()
+    '''
+    name = "replay"
+
+    def __init__(self, source: str, loop: bool = True, auto_advance: bool = True, origin: tuple[int, int] = (0, 0)):
+        self.source = source
+        self.loop = loop
+        self.auto_advance = auto_advance
+        self.origin = origin
+        self.index = 0
+        self._frames = [] # arrays or png paths, pngs are decoded on first use
+        self._lock = threading.Lock()
+        if os.path.isdir(source):
+            self._frames = sorted(glob.glob(os.path.join(source, "*.png")))
+        elif source.lower().endswith(".npz"):
+            with np.load(source) as data:
+                if "origin" in data.files:
+                    self.origin = tuple(int(v) for v in data["origin"])
+                if "frames" in data.files:
+                    self._frames = list(data["frames"])
+                else:
+                    self._frames = [data[key] for key in sorted(data.files) if key != "origin"]
+        elif os.path.isfile(source):
+            self._frames = [source]
+        if not self._frames:
+            raise FileNotFoundError(f"No frames found in {source}")
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def current(self) -> np.ndarray:
+        frame = self._frames[self.index]
+        if isinstance(frame, str):
+            frame = cv2.imdecode(np.fromfile(frame, dtype=np.uint8), cv2.IMREAD_COLOR)
+            self._frames[self.index] = frame
+        return frame
+
+    def advance(self) -> bool:
+        '''
+        Moves to the next frame, returns False once the last frame is reached and loop is off
+        '''
+        if self.index + 1 < len(self._frames):
+            self.index += 1
+            return True
+        if self.loop:
+            self.index = 0
+            return True
+        return False
+
+    def grab(self, bbox=None, out=None):
+        with self._lock:
+            frame = self.current()
+            if self.auto_advance:
+                self.advance()
+        fh, fw = frame.shape[:2]
+        ox, oy = self.origin
+        if bbox is None:
+            bbox = (ox, oy, ox + fw, oy + fh)
+        left, top, right, bottom = bbox
+        width, height = right - left, bottom - top
+        if out is None:
+            out = np.zeros((height, width, 3), dtype=np.uint8)
+        else:
+            out[:] = 0
+        # Off frame parts stay black like an off screen grab
+        x0, y0 = max(left - ox, 0), max(top - oy, 0)
+        x1, y1 = min(right - ox, fw), min(bottom - oy, fh)
+        if x1 > x0 and y1 > y0:
+            out[y0 - (top - oy):y1 - (top - oy), x0 - (left - ox):x1 - (left - ox)] = frame[y0:y1, x0:x1]
+        return out
+
+def create_backend(spec: str) -> CaptureBackend:
+    '''
+    spec: "win32", "win32:<window title>", "pil" or "replay:<path>"
+    With a title the grabs are relative to that window (ex: "win32:Roblox"), the title only has to be part of it
+    '''
+    kind, _, arg = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind == "win32":
+        if not arg.strip():
+            return Win32Capture()
+        from Tools import winTools as wt # not at the top, winTools imports this module
+        window = wt.get_window(arg.strip())
+        if window is None:
+            raise ValueError(f"No window titled {arg.strip()} for capture backend {spec}")
+        return Win32Capture(window._hWnd)
+    if kind == "pil":
+        return PILCapture()
+    if kind == "replay":
+        return ReplayCapture(arg)
+    raise ValueError(f"Unknown capture backend {spec}")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> CaptureBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                spec = os.environ.get("LENIVAYA_CAPTURE", "").strip()
+                if spec:
+                    _backend = create_backend(spec)
+                elif os.name == "nt":
+                    try:
+                        _backend = Win32Capture()
+                    except Exception as e:
+                        print(f"Win32 capture unavailable, using PIL: {e}")
+                        _backend = PILCapture()
+                else:
+                    _backend = PILCapture()
+    return _backend
+
+def set_backend(backend: CaptureBackend) -> None:
+    global _backend
+    with _backend_lock:
+        if _backend is not None and _backend is not backend:
+            _backend.close()
+        _backend = backend
+
+def grab(bbox: tuple[int, int, int, int] | None = None, out: np.ndarray | None = None) -> np.ndarray:
+    return get_backend().grab(bbox, out=out)
+
+def record(path: str, count: int, interval: float, bbox: tuple[int, int, int, int] | None = None) -> int:
+    '''
+    Saves count grabs from the current backend into an .npz that ReplayCapture can play back.
+    Returns the number of frames saved.
+    '''
+    frames = []
+    for _ in range(count):
+        frames.append(grab(bbox))
+        time.sleep(interval)
+    origin = np.array(bbox[:2] if bbox is not None else (0, 0))
+    np.savez_compressed(path, frames=np.stack(frames), origin=origin)
+    return len(frames)
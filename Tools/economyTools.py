@@ -0,0 +1,127 @@
+import time
+import threading
+from collections import deque
+
+# Yen bookkeeping for the shop trips. IncomeEstimator turns yen readings into an income rate,
+# Economy uses it with the prices from the settings to say when a purchase (or a trip buying
+# several things) becomes affordable, so the main flow only walks to a shop when it can buy.
+
+class IncomeEstimator:
+    '''
+    window: seconds of readings the rate is averaged over
+    Drops in yen are purchases, they end the current stretch but don't count as negative income.
+    '''
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.samples = deque() # (time, yen) since the last purchase
+        self.rate_history = deque() # (time, yen/s) of finished stretches still inside the window
+        self._lock = threading.Lock()
+
+    def add(self, yen: int, now: float | None = None) -> None:
+        if yen is None or yen < 0:
+            return
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self.samples and yen < self.samples[-1][1]:
+                rate = self._stretch_rate()
+                if rate is not None:
+                    self.rate_history.append((now, rate))
+                self.samples.clear()
+            self.samples.append((now, yen))
+            while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+                self.samples.popleft()
+            while self.rate_history and now - self.rate_history[0][0] > self.window:
+                self.rate_history.popleft()
+
+    def _stretch_rate(self) -> float | None:
+        if len(self.samples) < 2:
+            return None
+        (t0, y0), (t1, y1) = self.samples[0], self.samples[-1]
+        return (y1 - y0) / (t1 - t0) if t1 > t0 else None
+
+    def rate(self) -> float:
+        '''
+        Yen per second, 0 until there are two readings without a purchase between them
+        '''
+        with self._lock:
+            rates = [rate for _, rate in self.rate_history]
+            current = self._stretch_rate()
+        if current is not None:
+            rates.append(current)
+        return max(sum(rates) / len(rates), 0.0) if rates else 0.0
+
+    def balance(self, now: float | None = None) -> float | None:
+        '''
+        Predicted yen right now (last reading + income since), None before the first reading
+        '''
+        with self._lock:
+            if not self.samples:
+                return None
+            last_time, last_yen = self.samples[-1]
+        now = time.perf_counter() if now is None else now
+        return last_yen + self.rate() * (now - last_time)
+
+    def eta(self, price: float, now: float | None = None) -> float | None:
+        '''
+        Seconds until the balance reaches price, 0 if it already does, None if it can't be predicted
+        '''
+        balance = self.balance(now)
+        if balance is None:
+            return None
+        if balance >= price:
+            return 0.0
+        rate = self.rate()
+        return (price - balance) / rate if rate > 0 else None
+
+class Economy:
+    '''
+    read_yen: returns the yen on screen, -1 if it can't be read
+    prices: {item: yen}, 0 or missing means "don't wait for it"
+    '''
+    def __init__(self, read_yen, prices: dict | None = None, window: float = 60.0):
+        self.read_yen = read_yen
+        self.prices = dict(prices or {})
+        self.income = IncomeEstimator(window)
+
+    def sample(self) -> int:
+        '''
+        Reads the counter once and feeds the estimator, returns the reading
+        '''
+        yen = self.read_yen()
+        self.income.add(yen)
+        return yen
+
+    def price(self, *items: str) -> int:
+        return sum(self.prices.get(item, 0) or 0 for item in items)
+
+    def can_afford(self, *items: str) -> bool:
+        '''
+        True when the yen covers all items together, also True when nothing needs checking or the read failed
+        '''
+        price = self.price(*items)
+        if not price:
+            return True
+        yen = self.sample()
+        return yen < 0 or yen >= price
+
+    def eta(self, *items: str) -> float | None:
+        return self.income.eta(self.price(*items))
+
+    def wait_affordable(self, *items: str, cancel=None, timeout: float | None = None, min_check: float = 0.5, max_check: float = 5.0) -> bool:
+        '''
+        Blocks until can_afford(*items). Between checks it sleeps most of the predicted time
+        (clamped to min_check..max_check) instead of reading the counter at a fixed rate.
+        Returns False if cancel() came true or timeout ran out first.
+        '''
+        start = time.perf_counter()
+        while not self.can_afford(*items):
+            eta = self.eta(*items)
+            delay = min_check if eta is None else min(max(eta * 0.8, min_check), max_check)
+            end = time.perf_counter() + delay
+            while time.perf_counter() < end:
+                if cancel is not None and cancel():
+                    return False
+                time.sleep(min(0.25, max(end - time.perf_counter(), 0)))
+            if timeout is not None and time.perf_counter() - start >= timeout:
+                return False
+        return True
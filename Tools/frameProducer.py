@@ -0,0 +1,136 @@
+import time
+import threading
+from collections import deque
+from Tools import visionTools as vt
+
+# One capture thread for all the watchers (loss, disconnect, ...).
+# Watchers subscribe and read frames from here instead of grabbing their own,
+# so capture cost stays the same no matter how many watchers there are.
+
+class Subscription:
+    '''
+    A watcher's cursor into the producer, next() only ever returns frames it hasn't seen
+    '''
+    def __init__(self, producer: "FrameProducer"):
+        self.producer = producer
+        self.last_timestamp = 0.0
+
+    def next(self, timeout: float | None = None) -> vt.Frame | None:
+        '''
+        Blocks until a frame newer than the last one returned is ready, None on timeout or stop
+        '''
+        frame = self.producer.wait_newer(self.last_timestamp, timeout)
+        if frame is not None:
+            self.last_timestamp = frame.timestamp
+        return frame
+
+class FrameProducer:
+    '''
+    fps: how many grabs per second
+    region: (x,y,width,height) to grab, None for the whole screen
+    buffer_size: how many recent frames are kept
+    '''
+    def __init__(self, fps: float = 2, region: tuple | None = None, buffer_size: int = 4):
+        self.fps = fps
+        self.region = region
+        self.frames = deque(maxlen=buffer_size)
+        self.stats = {"frames": 0, "errors": 0, "capture_time": 0.0}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "FrameProducer":
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="FrameProducer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _run(self) -> None:
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                frame = vt.Frame.capture(self.region)
+                self.stats["frames"] += 1
+                self.stats["capture_time"] += time.perf_counter() - start
+                with self._cond:
+                    self.frames.append(frame)
+                    self._cond.notify_all()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Frame producer failed to grab: {e}")
+            # Fixed rate, if a grab runs long skip ahead instead of bursting to catch up
+            next_time = max(next_time + 1 / self.fps, time.perf_counter())
+            self._stop.wait(max(next_time - time.perf_counter(), 0))
+
+    def latest(self, max_age: float | None = None) -> vt.Frame | None:
+        '''
+        Newest frame, None if there isn't one or it's older than max_age seconds
+        '''
+        with self._cond:
+            frame = self.frames[-1] if self.frames else None
+        if frame is None:
+            return None
+        if max_age is not None and time.perf_counter() - frame.timestamp > max_age:
+            return None
+        return frame
+
+    def wait_newer(self, timestamp: float, timeout: float | None = None) -> vt.Frame | None:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while not self._stop.is_set():
+                if self.frames and self.frames[-1].timestamp > timestamp:
+                    return self.frames[-1]
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        return None
+
+    def subscribe(self) -> Subscription:
+        return Subscription(self)
+
+    def get_stats(self) -> dict:
+        frames = self.stats["frames"]
+        return {
+            **self.stats,
+            "avg_capture_ms": self.stats["capture_time"] / frames * 1000 if frames else 0.0,
+        }
+
+_producer = None
+
+def start(fps: float = 2, region: tuple | None = None) -> FrameProducer:
+    '''
+    Starts the shared producer (or returns it if it's already running)
+    '''
+    global _producer
+    if _producer is None:
+        _producer = FrameProducer(fps=fps, region=region)
+    return _producer.start()
+
+def get() -> FrameProducer | None:
+    return _producer
+
+def latest(max_age: float | None = None) -> vt.Frame | None:
+    if _producer is None:
+        return None
+    return _producer.latest(max_age)
+
+def subscribe() -> Subscription:
+    '''
+    Subscribes to the shared producer, starting it with defaults if needed
+    '''
+    return start().subscribe()
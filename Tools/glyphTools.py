@@ -0,0 +1,286 @@
+import os
+import re
+import sys
+import time
+import numpy as np
+import cv2
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # so it also runs as a script
+from Tools import ocrTools as ocr
+
+# Digit reader for the wave counter. The counter is always the same font, so instead of tesseract
+# every digit is cut out of the thresholded crop and compared against a small glyph set with numpy.
+# Tesseract is only asked when the glyph match isn't confident.
+# wave_digits.npz is cut from the real game crops in Utility/OCR_Corpus/wave. A digit missing from it would be
+# read as its closest neighbour, so the glyph match only runs once the set has all ten (GLYPH_OCR turns it off).
+# Until then everything goes to tesseract, add captures for the missing digits and rebuild:
+#   python Tools/glyphTools.py capture Utility/OCR_Corpus/wave <wave on screen>   (during a match)
+#   python Tools/glyphTools.py build Utility/OCR_Corpus/wave
+#   python Tools/glyphTools.py report Utility/OCR_Corpus/wave   (confident_misses has to be empty)
+
+Glyphs_Path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Resources", "Glyphs")
+Wave_Glyphs = os.path.join(Glyphs_Path, "wave_digits.npz")
+
+GLYPH_SIZE = (16, 24) # (width, height) every glyph is normalized to
+MIN_CONFIDENCE = 0.85 # correlation the worst digit needs, below that tesseract is used
+MIN_HEIGHT = 0.5 # blobs shorter than this fraction of the tallest one are noise
+MIN_AREA = 6 # blobs with fewer foreground pixels are noise
+WAVE_BBOX = (477, 154, 605, 179) # wave counter, same box as avMethods.get_wave
+
+enabled = True # glyph match on/off, tesseract reads everything while it's off (or the set isn't complete)
+
+_glyph_sets = {} # path -> (labels, normalized glyph matrix)
+_incomplete = set() # paths already reported as missing digits
+stats = {
+    "glyph": 0, # answered by the glyph match
+    "fallback": 0, # handed to tesseract
+    "time": 0.0, # seconds spent in the glyph match
+}
+
+def _binary(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 3:
+        image = image[:, :, 0]
+    return image > 127
+
+def components(binary: np.ndarray) -> list[tuple[tuple[int, int, int, int], np.ndarray]]:
+    '''
+    Splits a one line binary image into characters, returns [((x, y, width, height), glyph)] left to right
+    where glyph is the character's own pixels inside its box. Characters are the connected components,
+    so digits whose columns overlap (kerning, outlines) stay apart and don't leak into each other's box.
+    Components sitting inside another one's columns (a stray pixel under a digit) are merged into it.
+    '''
+    binary = _binary(binary) if binary.dtype != bool else binary
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary.view(np.uint8), connectivity=8)
+    groups = [] # [x, y, right, bottom, [component ids]]
+    for i in sorted(range(1, count), key=lambda i: stats[i, cv2.CC_STAT_LEFT]):
+        x, y, w, h, area = stats[i].tolist()
+        if area < MIN_AREA:
+            continue
+        if groups and x >= groups[-1][0] and x + w <= groups[-1][2]:
+            group = groups[-1]
+            group[1], group[3] = min(group[1], y), max(group[3], y + h)
+            group[4].append(i)
+            continue
+        groups.append([x, y, x + w, y + h, [i]])
+    if not groups:
+        return []
+    tallest = max(bottom - top for _, top, _, bottom, _ in groups)
+    found = []
+    for x, y, right, bottom, ids in groups:
+        if bottom - y < tallest * MIN_HEIGHT:
+            continue
+        glyph = np.isin(labels[y:bottom, x:right], ids)
+        found.append(((x, y, right - x, bottom - y), glyph))
+    return found
+
+def segment(binary: np.ndarray) -> list[tuple[int, int, int, int]]:
+    '''
+    Character boxes (x, y, width, height) left to right, see components
+    '''
+    return [box for box, _ in components(binary)]
+
+def normalize(glyph: np.ndarray) -> np.ndarray:
+    '''
+    Tight binary glyph -> GLYPH_SIZE float vector, aspect kept (narrow digits like 1 are padded, not stretched),
+    zero mean and unit length so a dot product is the correlation
+    '''
+    width, height = GLYPH_SIZE
+    h, w = glyph.shape
+    scale = height / h
+    new_w = min(width, max(1, int(round(w * scale))))
+    canvas = np.zeros((height, width), dtype=np.float32)
+    left = (width - new_w) // 2
+    # area averaging keeps partial coverage, a 1px shift of a thin stroke barely moves the score
+    canvas[:, left:left + new_w] = cv2.resize(glyph.astype(np.float32), (new_w, height), interpolation=cv2.INTER_AREA)
+    canvas -= canvas.mean()
+    norm = np.linalg.norm(canvas)
+    return (canvas / norm).ravel() if norm else canvas.ravel()
+
+def _tight(binary: np.ndarray) -> np.ndarray:
+    rows = np.flatnonzero(binary.any(axis=1))
+    cols = np.flatnonzero(binary.any(axis=0))
+    return binary[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+def load_glyphs(path: str = Wave_Glyphs):
+    '''
+    Returns (labels, matrix) where matrix rows are the normalized glyphs, cached per path
+    '''
+    entry = _glyph_sets.get(path)
+    if entry is None:
+        data = np.load(path)
+        labels = [str(label) for label in data["labels"]]
+        matrix = np.stack([normalize(_tight(glyph > 0)) for glyph in data["glyphs"]])
+        entry = (labels, matrix)
+        _glyph_sets[path] = entry
+    return entry
+
+def recognize(image: np.ndarray, path: str = Wave_Glyphs) -> tuple[str, float]:
+    '''
+    image: thresholded crop (what get_wave hands to ocr)
+    Returns (text, confidence) where confidence is the correlation of the worst matched digit, 0 if nothing was found
+    '''
+    found = components(_binary(image))
+    if not found:
+        return "", 0.0
+    labels, matrix = load_glyphs(path)
+    vectors = np.stack([normalize(glyph) for _, glyph in found])
+    scores = vectors @ matrix.T
+    best = scores.argmax(axis=1)
+    text = "".join(labels[i] for i in best)
+    return text, float(scores[np.arange(len(best)), best].min())
+
+def set_enabled(on: bool) -> None:
+    global enabled
+    enabled = bool(on)
+
+def usable(path: str = Wave_Glyphs) -> bool:
+    '''
+    True when the glyph match is on and the set at path has every digit
+    '''
+    if not enabled:
+        return False
+    try:
+        missing = sorted(set(ocr.DIGITS) - set(load_glyphs(path)[0]))
+    except Exception as e:
+        missing = [f"unreadable: {e}"]
+    if missing and path not in _incomplete:
+        _incomplete.add(path)
+        print(f"Glyph set {os.path.basename(path)} is missing {', '.join(missing)}, reading with tesseract")
+    return not missing
+
+def read_digits(image: np.ndarray, min_confidence: float = MIN_CONFIDENCE, path: str = Wave_Glyphs, memo: bool = True) -> str:
+    '''
+    Glyph match first (if usable), tesseract (digits only) when the glyph match isn't sure.
+    Same crop as last time (the counter only changes once a wave) -> the remembered answer, unless memo is off.
+    '''
+    if not usable(path):
+        return ocr.read(image, whitelist=ocr.DIGITS, memo=memo)
+    if not memo:
+        return _read_digits(image, min_confidence, path)
+    return ocr.memoized(image, ("glyph", min_confidence, path), lambda: _read_digits(image, min_confidence, path))
+
+def _read_digits(image, min_confidence, path):
+    start = time.perf_counter()
+    try:
+        text, confidence = recognize(image, path)
+    except Exception as e:
+        print(f"Glyph match failed: {e}")
+        text, confidence = "", 0.0
+    stats["time"] += time.perf_counter() - start
+    if text and confidence >= min_confidence:
+        stats["glyph"] += 1
+        return text
+    stats["fallback"] += 1
+    return ocr.read(image, whitelist=ocr.DIGITS, memo=False) # memo already handled by read_digits
+
+def get_stats() -> dict:
+    total = stats["glyph"] + stats["fallback"]
+    return {
+        **stats,
+        "glyph_rate": stats["glyph"] / total if total else 0.0,
+        "avg_ms": stats["time"] / total * 1000 if total else 0.0,
+    }
+
+def _read_crop(path: str) -> np.ndarray:
+    '''
+    Thresholded crop as get_wave hands it over, raw screen crops (Utility/OCR_Corpus) are run through the same preprocessing
+    '''
+    image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if np.isin(image, (0, 255)).all():
+        return image[:, :, 0]
+    height, width = image.shape[:2]
+    return ocr.preprocessor((0, 0, width, height)).process(image).copy()
+
+def _label(file: str) -> str:
+    # crops are named <label>_<anything>.png, ex: 137_0001.png
+    return re.match(r"[^_.]+", file).group(0)
+
+def build_glyphs(crops_dir: str, path: str = Wave_Glyphs) -> dict[str, int]:
+    '''
+    Rebuilds the glyph set from labelled crops (thresholded, named <wave>_<anything>.png).
+    Every crop whose digit count matches its label adds its digits, each digit's glyph is the average.
+    Returns how many samples each digit got.
+    '''
+    samples = {}
+    for file in sorted(os.listdir(crops_dir)):
+        if not file.lower().endswith(".png"):
+            continue
+        label = _label(file)
+        found = components(_read_crop(os.path.join(crops_dir, file)))
+        if len(found) != len(label):
+            continue
+        for char, (_, glyph) in zip(label, found):
+            samples.setdefault(char, []).append(glyph)
+    labels = sorted(samples)
+    if not labels:
+        raise ValueError(f"No usable crops in {crops_dir}")
+    glyphs = []
+    for char in labels:
+        height = int(np.median([g.shape[0] for g in samples[char]]))
+        width = int(np.median([g.shape[1] for g in samples[char]]))
+        stack = [cv2.resize(g.astype(np.uint8) * 255, (width, height), interpolation=cv2.INTER_AREA) for g in samples[char]]
+        glyphs.append((np.mean(stack, axis=0) > 127).astype(np.uint8) * 255)
+    size = max(g.shape[0] for g in glyphs), max(g.shape[1] for g in glyphs)
+    padded = np.zeros((len(glyphs), *size), dtype=np.uint8) # npz wants one array, glyphs sit top left
+    for i, glyph in enumerate(glyphs):
+        padded[i, :glyph.shape[0], :glyph.shape[1]] = glyph
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, labels=np.array(labels), glyphs=padded)
+    _glyph_sets.pop(path, None)
+    return {char: len(samples[char]) for char in labels}
+
+def report(crops_dir: str, min_confidence: float = MIN_CONFIDENCE, path: str = Wave_Glyphs) -> dict:
+    '''
+    Accuracy of the glyph match on labelled crops (named <wave>_<anything>.png), no tesseract involved.
+    confident_accuracy only counts reads at or above min_confidence, those are the ones read_digits keeps.
+    '''
+    total = correct = confident = confident_correct = 0
+    times = []
+    misses = []
+    for file in sorted(os.listdir(crops_dir)):
+        if not file.lower().endswith(".png"):
+            continue
+        label = _label(file)
+        image = _read_crop(os.path.join(crops_dir, file))
+        start = time.perf_counter()
+        text, confidence = recognize(image, path)
+        times.append(time.perf_counter() - start)
+        total += 1
+        correct += text == label
+        if confidence >= min_confidence:
+            confident += 1
+            confident_correct += text == label
+            if text != label:
+                misses.append((file, text, round(confidence, 3))) # these would be returned as the wave
+    times_ms = np.array(times) * 1000 if times else np.zeros(1)
+    return {
+        "crops": total,
+        "accuracy": correct / total if total else 0.0,
+        "confident": confident / total if total else 0.0, # share that wouldn't go to tesseract
+        "confident_accuracy": confident_correct / confident if confident else 0.0,
+        "p50_ms": float(np.percentile(times_ms, 50)),
+        "p99_ms": float(np.percentile(times_ms, 99)),
+        "confident_misses": misses,
+    }
+
+def capture(crops_dir: str, label: str, bbox: tuple[int, int, int, int] = WAVE_BBOX) -> str:
+    '''
+    Saves the counter as it is on screen right now, thresholded like get_wave does, as <label>_<time>.png
+    '''
+    os.makedirs(crops_dir, exist_ok=True)
+    file = os.path.join(crops_dir, f"{label}_{int(time.time() * 1000)}.png")
+    cv2.imwrite(file, ocr.Preprocessor(bbox).process())
+    return file
+
+if __name__ == "__main__":
+    # python Tools/glyphTools.py report|build <crops dir>  |  python Tools/glyphTools.py capture <crops dir> <wave>
+    if len(sys.argv) == 4 and sys.argv[1] == "capture":
+        print(capture(sys.argv[2], sys.argv[3]))
+        sys.exit(0)
+    if len(sys.argv) != 3 or sys.argv[1] not in ("report", "build"):
+        print("usage: glyphTools.py report|build <labelled crops dir>  or  glyphTools.py capture <crops dir> <wave on screen>")
+        sys.exit(1)
+    if sys.argv[1] == "build":
+        print(build_glyphs(sys.argv[2]))
+    else:
+        for key, value in report(sys.argv[2]).items():
+            print(f"{key}: {value}")
@@ -0,0 +1,368 @@
+import os
+import time
+import json
+import threading
+
+# Keyboard/mouse output. Every action is a list of events handed to a backend's send() in one go:
+#   ("key_down", key) ("key_up", key) ("move", x, y) ("move_rel", dx, dy)
+#   ("mouse_down", button) ("mouse_up", button) ("scroll", amount)
+# Pick one with the LENIVAYA_INPUT env var: "sendinput" or "record" (logs only, works headless on linux)
+# The waits between actions belong here too: pause() is a deliberate wait, pace() only waits out what's left
+# of a gap since the last input. That gap is only right if nothing sends input around the backend,
+# so key presses go through press/key_down/key_up/write too, not the keyboard module. Both are counted, and so are path holds/waits (pathTools reports them with
+# count_wait), so a run can tell input time from waiting. Plain time.sleep calls elsewhere aren't counted,
+# summary() shows them as part of "other" (run time minus the two).
+
+GAP = 0.1 # pace() default, what pyautogui.PAUSE used to add after every call
+
+class InputBackend:
+    name = "base"
+
+    def __init__(self):
+        self.stats = {"calls": 0, "events": 0, "time": 0.0, "waits": 0, "wait_time": 0.0}
+        self.last_input = 0.0 # perf_counter when the last send finished
+        self.stats_since = time.perf_counter() # when the stats were last reset
+
+    def _send(self, events: list[tuple]) -> None:
+        raise NotImplementedError
+
+    def send(self, events: list[tuple]) -> None:
+        '''
+        Submits the whole sequence at once
+        '''
+        if not events:
+            return
+        start = time.perf_counter()
+        self._send(events)
+        self.stats["calls"] += 1
+        self.stats["events"] += len(events)
+        self.last_input = time.perf_counter()
+        self.stats["time"] += self.last_input - start
+
+    def pause(self, seconds: float) -> None:
+        '''
+        Deliberate wait between actions (counted in wait_time)
+        '''
+        if seconds <= 0:
+            return
+        start = time.perf_counter()
+        time.sleep(seconds)
+        self.count_wait(time.perf_counter() - start)
+
+    def count_wait(self, seconds: float) -> None:
+        '''
+        Books a wait that was timed somewhere else (pathTools holds and waits)
+        '''
+        self.stats["waits"] += 1
+        self.stats["wait_time"] += seconds
+
+    def pace(self, gap: float = GAP) -> None:
+        '''
+        Waits until gap seconds passed since the last input, nothing if the caller already waited that long
+        '''
+        self.pause(self.last_input + gap - time.perf_counter())
+
+    def key_down(self, key: str) -> None:
+        self.send([("key_down", key)])
+
+    def key_up(self, key: str) -> None:
+        self.send([("key_up", key)])
+
+    def press(self, key: str, times: int = 1) -> None:
+        '''
+        times presses of key in one call (set_boss's five r's are one send)
+        '''
+        self.send([("key_down", key), ("key_up", key)] * times)
+
+    def tap(self, *keys: str, gap: float = 0.0) -> None:
+        '''
+        Presses keys in order, gap: seconds between them (0 = one call for all of them)
+        '''
+        if gap <= 0:
+            self.send([event for key in keys for event in (("key_down", key), ("key_up", key))])
+            return
+        for i, key in enumerate(keys):
+            if i:
+                self.pause(gap)
+            self.press(key)
+
+    def write(self, text: str) -> None:
+        '''
+        Types text in one send, capitals are sent with shift held
+        '''
+        events = []
+        for char in text:
+            keys = [("key_down", char.lower()), ("key_up", char.lower())]
+            events += [("key_down", "shift"), *keys, ("key_up", "shift")] if char.isupper() else keys
+        self.send(events)
+
+    def move(self, x: int, y: int) -> None:
+        self.send([("move", int(x), int(y))])
+
+    def move_relative(self, dx: int, dy: int) -> None:
+        self.send([("move_rel", int(dx), int(dy))])
+
+    def click(self, x: int | None = None, y: int | None = None, button: str = "left") -> None:
+        '''
+        Click at x,y (or where the mouse is), the move and the click are one send
+        '''
+        events = [] if x is None else [("move", int(x), int(y))]
+        self.send(events + [("mouse_down", button), ("mouse_up", button)])
+
+    def scroll(self, amount: int) -> None:
+        '''
+        amount: wheel delta, 120 is one notch, negative scrolls down (paced, it usually follows a click)
+        '''
+        self.pace()
+        self.send([("scroll", int(amount))])
+
+    def get_stats(self) -> dict:
+        calls = self.stats["calls"]
+        return {
+            **self.stats,
+            "avg_call_ms": self.stats["time"] / calls * 1000 if calls else 0.0,
+            "elapsed": time.perf_counter() - self.stats_since,
+        }
+
+    def reset_stats(self) -> None:
+        for key in self.stats:
+            self.stats[key] = 0.0 if isinstance(self.stats[key], float) else 0
+        self.stats_since = time.perf_counter()
+
+    def close(self) -> None:
+        pass
+
+class SendInputBackend(InputBackend):
+    '''
+    user32.SendInput with scan codes (what the game reads, like pydirectinput), a whole sequence is one SendInput call
+    '''
+    name = "sendinput"
+    INPUT_MOUSE = 0
+    INPUT_KEYBOARD = 1
+    KEYEVENTF_EXTENDEDKEY = 0x0001
+    KEYEVENTF_KEYUP = 0x0002
+    KEYEVENTF_SCANCODE = 0x0008
+    MOUSEEVENTF_MOVE = 0x0001
+    MOUSEEVENTF_ABSOLUTE = 0x8000
+    MOUSEEVENTF_WHEEL = 0x0800
+    BUTTON_FLAGS = {"left": (0x0002, 0x0004), "right": (0x0008, 0x0010), "middle": (0x0020, 0x0040)}
+    # Virtual key codes for named keys, single characters go through VkKeyScanW
+    VK_CODES = {
+        "backspace": 0x08, "tab": 0x09, "enter": 0x0D, "shift": 0x10, "ctrl": 0x11, "alt": 0x12,
+        "esc": 0x1B, "escape": 0x1B, "space": 0x20, "pageup": 0x21, "pagedown": 0x22, "end": 0x23, "home": 0x24,
+        "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28, "insert": 0x2D, "delete": 0x2E,
+        **{f"f{i}": 0x6F + i for i in range(1, 13)},
+    }
+    EXTENDED = {"left", "up", "right", "down", "insert", "delete", "home", "end", "pageup", "pagedown"}
+
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        self._ctypes = ctypes
+        ULONG_PTR = ctypes.c_size_t
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", ctypes.c_long), ("dy", ctypes.c_long), ("mouseData", ctypes.c_long),
+                        ("dwFlags", ctypes.c_ulong), ("time", ctypes.c_ulong), ("dwExtraInfo", ULONG_PTR)]
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", ctypes.c_ushort), ("wScan", ctypes.c_ushort), ("dwFlags", ctypes.c_ulong),
+                        ("time", ctypes.c_ulong), ("dwExtraInfo", ULONG_PTR)]
+
+        class HARDWAREINPUT(ctypes.Structure):
+            _fields_ = [("uMsg", ctypes.c_ulong), ("wParamL", ctypes.c_ushort), ("wParamH", ctypes.c_ushort)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _anonymous_ = ("u",)
+            _fields_ = [("type", ctypes.c_ulong), ("u", _INPUTUNION)]
+
+        self._INPUT = INPUT
+        self._user32 = ctypes.windll.user32
+        self._user32.SendInput.argtypes = [ctypes.c_uint, ctypes.POINTER(INPUT), ctypes.c_int]
+        self._user32.SendInput.restype = ctypes.c_uint
+        self._scan_codes = {}
+        self._lock = threading.Lock()
+
+    def _scan_code(self, key: str) -> tuple[int, int]:
+        code = self._scan_codes.get(key)
+        if code is None:
+            name = key.lower()
+            if name in self.VK_CODES:
+                vk = self.VK_CODES[name]
+            elif len(key) == 1:
+                vk = self._user32.VkKeyScanW(ord(key)) & 0xFF
+            else:
+                raise ValueError(f"Unknown key {key}")
+            scan = self._user32.MapVirtualKeyW(vk, 0) # MAPVK_VK_TO_VSC
+            flags = self.KEYEVENTF_SCANCODE | (self.KEYEVENTF_EXTENDEDKEY if name in self.EXTENDED else 0)
+            code = (scan, flags)
+            self._scan_codes[key] = code
+        return code
+
+    def _screen_scale(self) -> tuple[float, float]:
+        width = self._user32.GetSystemMetrics(0)
+        height = self._user32.GetSystemMetrics(1)
+        return 65535 / max(width - 1, 1), 65535 / max(height - 1, 1)
+
+    def _send(self, events):
+        inputs = (self._INPUT * len(events))()
+        scale = None
+        for item, event in zip(inputs, events):
+            kind = event[0]
+            if kind in ("key_down", "key_up"):
+                scan, flags = self._scan_code(event[1])
+                item.type = self.INPUT_KEYBOARD
+                item.ki.wScan = scan
+                item.ki.dwFlags = flags | (self.KEYEVENTF_KEYUP if kind == "key_up" else 0)
+                continue
+            item.type = self.INPUT_MOUSE
+            if kind == "move":
+                scale = scale or self._screen_scale()
+                item.mi.dx = int(round(event[1] * scale[0]))
+                item.mi.dy = int(round(event[2] * scale[1]))
+                item.mi.dwFlags = self.MOUSEEVENTF_MOVE | self.MOUSEEVENTF_ABSOLUTE
+            elif kind == "move_rel":
+                item.mi.dx, item.mi.dy = event[1], event[2]
+                item.mi.dwFlags = self.MOUSEEVENTF_MOVE
+            elif kind in ("mouse_down", "mouse_up"):
+                down, up = self.BUTTON_FLAGS[event[1]]
+                item.mi.dwFlags = down if kind == "mouse_down" else up
+            elif kind == "scroll":
+                item.mi.mouseData = event[1]
+                item.mi.dwFlags = self.MOUSEEVENTF_WHEEL
+            else:
+                raise ValueError(f"Unknown input event {event}")
+        with self._lock:
+            sent = self._user32.SendInput(len(events), inputs, self._ctypes.sizeof(self._INPUT))
+        if sent != len(events):
+            print(f"SendInput only sent {sent}/{len(events)} events")
+
+class RecordingBackend(InputBackend):
+    '''
+    Logs every event with its perf_counter time instead of (or before, with passthrough) sending it.
+    Lets flows be timed and checked without a game or a Windows desktop.
+    '''
+    name = "record"
+
+    def __init__(self, passthrough: InputBackend | None = None):
+        super().__init__()
+        self.passthrough = passthrough
+        self.events = [] # (time, event)
+        self._lock = threading.Lock()
+
+    def _send(self, events):
+        now = time.perf_counter()
+        with self._lock:
+            self.events.extend((now, event) for event in events)
+        if self.passthrough is not None:
+            self.passthrough.send(events)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.events.clear()
+
+    def save(self, path: str) -> None:
+        '''
+        Writes the log as json lines: {"t": seconds since the first event, "event": [...]}
+        '''
+        with self._lock:
+            events = list(self.events)
+        start = events[0][0] if events else 0.0
+        with open(path, "w") as f:
+            for t, event in events:
+                f.write(json.dumps({"t": round(t - start, 6), "event": list(event)}) + "\n")
+
+def create_backend(spec: str) -> InputBackend:
+    '''
+    spec: "sendinput", "record" or "record+sendinput" (log and send)
+    '''
+    spec = spec.strip().lower()
+    if spec == "sendinput":
+        return SendInputBackend()
+    if spec == "record":
+        return RecordingBackend()
+    if spec == "record+sendinput":
+        return RecordingBackend(passthrough=SendInputBackend())
+    raise ValueError(f"Unknown input backend {spec}")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> InputBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                spec = os.environ.get("LENIVAYA_INPUT", "").strip()
+                if spec:
+                    _backend = create_backend(spec)
+                elif os.name == "nt":
+                    _backend = SendInputBackend()
+                else:
+                    _backend = RecordingBackend()
+    return _backend
+
+def set_backend(backend: InputBackend) -> None:
+    global _backend
+    with _backend_lock:
+        if _backend is not None and _backend is not backend:
+            _backend.close()
+        _backend = backend
+
+def send(events: list[tuple]) -> None:
+    get_backend().send(events)
+
+def key_down(key: str) -> None:
+    get_backend().key_down(key)
+
+def key_up(key: str) -> None:
+    get_backend().key_up(key)
+
+def press(key: str, times: int = 1) -> None:
+    get_backend().press(key, times)
+
+def tap(*keys: str, gap: float = 0.0) -> None:
+    get_backend().tap(*keys, gap=gap)
+
+def write(text: str) -> None:
+    get_backend().write(text)
+
+def move(x: int, y: int) -> None:
+    get_backend().move(x, y)
+
+def move_relative(dx: int, dy: int) -> None:
+    get_backend().move_relative(dx, dy)
+
+def click(x: int | None = None, y: int | None = None, button: str = "left") -> None:
+    get_backend().click(x, y, button)
+
+def scroll(amount: int) -> None:
+    get_backend().scroll(amount)
+
+def pause(seconds: float) -> None:
+    get_backend().pause(seconds)
+
+def pace(gap: float = GAP) -> None:
+    get_backend().pace(gap)
+
+def count_wait(seconds: float) -> None:
+    get_backend().count_wait(seconds)
+
+def get_stats() -> dict:
+    return get_backend().get_stats()
+
+def reset_stats() -> None:
+    get_backend().reset_stats()
+
+def summary() -> str:
+    '''
+    One line for the end of a run: time spent sending input, in counted waits (click delays, pacing, path
+    holds/waits) and everything else (time.sleep calls, screen checks, OCR) since the last reset_stats
+    '''
+    stats = get_stats()
+    other = max(stats["elapsed"] - stats["time"] - stats["wait_time"], 0.0)
+    return (f"input {stats['time']:.2f}s in {stats['calls']} calls ({stats['avg_call_ms']:.2f} ms avg), "
+            f"input waits {stats['wait_time']:.2f}s in {stats['waits']}, other {other:.0f}s of {stats['elapsed']:.0f}s")
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import atexit
+import threading
+from Tools import templateCache as tc
+from Tools import visionTools as vt
+
+# Remembers where each template was last found so the next search can start there.
+# Saved next to Winter_Event.json so it survives the relaunches. Matches only mark the boxes dirty,
+# a background thread writes them every SAVE_INTERVAL seconds (and at exit) so no match waits on the disk.
+Settings_Path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Settings")
+Learned_Json = os.path.join(Settings_Path, "Learned_Regions.json")
+
+LEARN_PAD = 40 # Pixels added around the last seen box
+SAVE_MOVE = 4 # Only rewrite the json when a box moved more than this
+SAVE_INTERVAL = 10.0 # seconds between writes of changed boxes
+
+_boxes = {} # template key -> [left, top, width, height]
+_lock = threading.Lock()
+_save_lock = threading.Lock() # one writer at a time
+_dirty = False
+_saver = None
+stats = {
+    "learned_hits": 0, # found inside the learned region
+    "fallbacks": 0, # had to search the full region
+}
+
+def load() -> None:
+    try:
+        if os.path.isfile(Learned_Json):
+            with open(Learned_Json, 'r') as f:
+                data = json.load(f)
+            with _lock:
+                _boxes.clear()
+                _boxes.update({k: list(v) for k, v in data.items()})
+    except Exception as e:
+        print(f"Failed to load learned regions: {e}")
+
+def save() -> None:
+    '''
+    Writes the boxes now (temp file + replace, so a crash or a second writer can't leave a broken json)
+    '''
+    global _dirty
+    try:
+        with _save_lock:
+            with _lock:
+                data = dict(_boxes)
+                _dirty = False
+            os.makedirs(Settings_Path, exist_ok=True)
+            temp = Learned_Json + ".tmp"
+            with open(temp, 'w') as f:
+                json.dump(data, f, indent=4)
+            os.replace(temp, Learned_Json)
+    except Exception as e:
+        print(f"Failed to save learned regions: {e}")
+
+def flush() -> None:
+    '''
+    Saves only if something changed since the last write
+    '''
+    if _dirty:
+        save()
+
+def _save_loop() -> None:
+    while True:
+        time.sleep(SAVE_INTERVAL)
+        flush()
+
+def _mark_dirty() -> None:
+    global _dirty, _saver
+    _dirty = True
+    if _saver is None:
+        _saver = threading.Thread(target=_save_loop, name="LearnedRegionsSaver", daemon=True)
+        _saver.start()
+
+def get(name: str):
+    return _boxes.get(tc.template_key(name))
+
+def remember(name: str, box: tuple[int, int, int, int]) -> None:
+    key = tc.template_key(name)
+    box = [int(v) for v in box]
+    with _lock:
+        old = _boxes.get(key)
+        if old is not None and all(abs(a - b) <= SAVE_MOVE for a, b in zip(old, box)):
+            return
+        _boxes[key] = box
+        _mark_dirty()
+
+def forget(name: str | None = None) -> None:
+    '''
+    Drops one learned box (or all of them with None)
+    '''
+    with _lock:
+        if name is None:
+            _boxes.clear()
+        else:
+            _boxes.pop(tc.template_key(name), None)
+        _mark_dirty()
+
+def search_region(name: str, region: tuple | None = None):
+    '''
+    Padded region around the last seen box, kept inside region if one is given.
+    Returns (left, top, width, height) or None if nothing is learned yet.
+    '''
+    box = get(name)
+    if box is None:
+        return None
+    left, top = box[0] - LEARN_PAD, box[1] - LEARN_PAD
+    right, bottom = box[0] + box[2] + LEARN_PAD, box[1] + box[3] + LEARN_PAD
+    if region is not None:
+        r_left, r_top, r_right, r_bottom = vt.region_to_bbox(region)
+        left, top = max(left, r_left), max(top, r_top)
+        right, bottom = min(right, r_right), min(bottom, r_bottom)
+    left, top = max(left, 0), max(top, 0)
+    if right - left < box[2] or bottom - top < box[3]:
+        return None
+    return (left, top, right - left, bottom - top)
+
+def get_stats() -> dict:
+    total = stats["learned_hits"] + stats["fallbacks"]
+    return {
+        **stats,
+        "learned": len(_boxes),
+        "hit_rate": stats["learned_hits"] / total if total else 0.0,
+    }
+
+load()
+atexit.register(flush)
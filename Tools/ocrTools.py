@@ -0,0 +1,333 @@
+import os
+import ctypes
+import threading
+from collections import OrderedDict
+import numpy as np
+import cv2
+from Tools import captureTools as ct
+
+# OCR engines for avMethods. The in process engine talks to the bundled libtesseract through its C api,
+# so tessdata is loaded once and a read is just SetImage + GetUTF8Text instead of spawning tesseract.exe.
+
+Tesseract_Path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tesseract")
+Tessdata_Path = os.path.join(Tesseract_Path, "tessdata")
+
+DIGITS = "0123456789"
+LETTERS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+PSM_SINGLE_LINE = 7
+PSM_BLOCK = 6 # uniform block of text, one line per stacked crop in read_batch
+BATCH_GAP = 16 # blank rows between stacked crops so tesseract never joins two of them
+BATCH_PAD = 8 # blank border around the stacked image
+MEMO_SIZE = 256 # binarized crops remembered, the wave crop is the same for a whole wave
+
+class OCREngine:
+    name = "base"
+
+    def read(self, image: np.ndarray, whitelist: str | None = None, psm: int = PSM_SINGLE_LINE) -> str:
+        '''
+        image: 2D uint8 (already thresholded), returns the raw text
+        '''
+        raise NotImplementedError
+
+    def confidence(self) -> int:
+        '''
+        Mean confidence (0-100) of the last read, -1 if the engine can't tell
+        '''
+        return -1
+
+    def close(self) -> None:
+        pass
+
+class TesseractAPI(OCREngine):
+    '''
+    In process tesseract through the C api of the bundled library, one instance loads eng.traineddata once
+    '''
+    name = "tesseract-api"
+
+    def __init__(self, library: str | None = None, tessdata: str = Tessdata_Path, language: str = "eng"):
+        self._lib = self._load_library(library)
+        lib = self._lib
+        lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        lib.TessBaseAPIInit3.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPIInit3.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPISetVariable.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPISetVariable.restype = ctypes.c_int
+        lib.TessBaseAPISetImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        lib.TessBaseAPISetSourceResolution.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p # raw pointer so it can be freed with TessDeleteText
+        lib.TessBaseAPIMeanTextConf.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIMeanTextConf.restype = ctypes.c_int
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+        self._handle = lib.TessBaseAPICreate()
+        if lib.TessBaseAPIInit3(self._handle, tessdata.encode(), language.encode()) != 0:
+            lib.TessBaseAPIDelete(self._handle)
+            self._handle = None
+            raise RuntimeError(f"Tesseract failed to load {language} from {tessdata}")
+        self._lock = threading.Lock() # one TessBaseAPI can't be used from two threads at once
+        self._whitelist = None
+        self._psm = None
+
+    @staticmethod
+    def _load_library(library: str | None):
+        if library is not None:
+            return ctypes.CDLL(library)
+        if os.name == "nt":
+            dll = os.path.join(Tesseract_Path, "libtesseract-5.dll")
+            os.add_dll_directory(Tesseract_Path) # leptonica, icu, ... live next to it
+            return ctypes.CDLL(dll)
+        for name in ("libtesseract.so.5", "libtesseract.so", "libtesseract.5.dylib", "libtesseract.dylib"):
+            try:
+                return ctypes.CDLL(name)
+            except OSError:
+                continue
+        raise OSError("libtesseract not found")
+
+    def read(self, image, whitelist=None, psm=PSM_SINGLE_LINE):
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        if image.ndim != 2:
+            raise ValueError("OCR expects a 2D (gray/binary) image")
+        lib = self._lib
+        with self._lock:
+            if psm != self._psm:
+                lib.TessBaseAPISetPageSegMode(self._handle, psm)
+                self._psm = psm
+            if whitelist != self._whitelist:
+                lib.TessBaseAPISetVariable(self._handle, b"tessedit_char_whitelist", (whitelist or "").encode())
+                self._whitelist = whitelist
+            height, width = image.shape
+            lib.TessBaseAPISetImage(self._handle, image.ctypes.data, width, height, 1, image.strides[0])
+            lib.TessBaseAPISetSourceResolution(self._handle, 70) # same default tesseract.exe falls back to
+            text_ptr = lib.TessBaseAPIGetUTF8Text(self._handle)
+            if not text_ptr:
+                return ""
+            try:
+                return ctypes.string_at(text_ptr).decode("utf-8", errors="ignore")
+            finally:
+                lib.TessDeleteText(text_ptr)
+
+    def confidence(self):
+        with self._lock:
+            return int(self._lib.TessBaseAPIMeanTextConf(self._handle))
+
+    def close(self):
+        if self._handle:
+            with self._lock:
+                self._lib.TessBaseAPIEnd(self._handle)
+                self._lib.TessBaseAPIDelete(self._handle)
+                self._handle = None
+
+class PytesseractEngine(OCREngine):
+    '''
+    Old path, runs tesseract.exe for every read. Only used when the library can't be loaded.
+    '''
+    name = "pytesseract"
+
+    def __init__(self):
+        import pytesseract
+        self._pytesseract = pytesseract
+        exe = os.path.join(Tesseract_Path, "tesseract.exe")
+        if os.path.isfile(exe):
+            pytesseract.pytesseract.tesseract_cmd = exe
+        os.environ["TESSDATA_PREFIX"] = Tessdata_Path
+
+    def read(self, image, whitelist=None, psm=PSM_SINGLE_LINE):
+        config = f"--psm {psm}"
+        if whitelist:
+            config += f" -c tessedit_char_whitelist={whitelist}"
+        return self._pytesseract.image_to_string(image, config=config)
+
+class Preprocessor:
+    '''
+    Grab -> gray -> threshold -> upscale for one region, every step writes into buffers made once,
+    so a read allocates nothing. The returned image is one of those buffers: only valid until the next
+    process() call, hold lock while using it if other threads read the same region.
+    bbox: (x1,y1,x2,y2) like screenshot_region
+    nearest: upscale with nearest neighbour, keeps the image strictly binary and is cheaper than cubic
+    '''
+    def __init__(self, bbox: tuple[int, int, int, int], threshold: int = 230, scale: int = 2, nearest: bool = False):
+        self.bbox = tuple(bbox)
+        self.threshold = threshold
+        self.scale = scale
+        self.interpolation = cv2.INTER_NEAREST if nearest else cv2.INTER_CUBIC
+        width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        self.bgr = np.empty((height, width, 3), dtype=np.uint8)
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.binary = np.empty((height, width), dtype=np.uint8)
+        self.scaled = np.empty((height * scale, width * scale), dtype=np.uint8)
+        self.lock = threading.Lock()
+
+    def process(self, image: np.ndarray | None = None) -> np.ndarray:
+        '''
+        image: BGR crop to use instead of grabbing the region
+        '''
+        if image is None:
+            image = ct.grab(bbox=self.bbox, out=self.bgr)
+        cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.threshold(self.gray, self.threshold, 255, cv2.THRESH_BINARY, dst=self.binary)
+        cv2.resize(self.binary, (self.scaled.shape[1], self.scaled.shape[0]), dst=self.scaled, interpolation=self.interpolation)
+        return self.scaled
+
+_preprocessors = {}
+
+def preprocessor(bbox: tuple[int, int, int, int], threshold: int = 230, scale: int = 2, nearest: bool = False) -> Preprocessor:
+    '''
+    Shared Preprocessor for these settings, made on first use
+    '''
+    key = (tuple(bbox), threshold, scale, nearest)
+    pre = _preprocessors.get(key)
+    if pre is None:
+        pre = _preprocessors.setdefault(key, Preprocessor(bbox, threshold, scale, nearest))
+    return pre
+
+_engine = None
+_engine_lock = threading.Lock()
+_memo = OrderedDict() # (kind, options, shape, packed bits) -> text, oldest first
+_memo_lock = threading.Lock()
+memo_stats = {"hits": 0, "misses": 0, "evictions": 0}
+batch_stats = {"batches": 0, "fields": 0, "fallbacks": 0} # fallbacks: line count didn't match, read one by one
+
+def create_engine(name: str) -> OCREngine:
+    '''
+    name: "tesseract-api" or "pytesseract"
+    '''
+    if name == TesseractAPI.name:
+        return TesseractAPI()
+    if name == PytesseractEngine.name:
+        return PytesseractEngine()
+    raise ValueError(f"Unknown OCR engine {name}")
+
+def get_engine() -> OCREngine:
+    '''
+    Shared engine, in process tesseract if it loads, otherwise pytesseract
+    '''
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                try:
+                    _engine = TesseractAPI()
+                except Exception as e:
+                    print(f"In process tesseract unavailable, falling back to tesseract.exe: {e}")
+                    _engine = PytesseractEngine()
+    return _engine
+
+def set_engine(engine: OCREngine) -> None:
+    global _engine
+    with _engine_lock:
+        if _engine is not None and _engine is not engine:
+            _engine.close()
+        _engine = engine
+    clear_memo() # answers from the old engine
+
+def memoized(image: np.ndarray, options: tuple, compute):
+    '''
+    Returns compute() for this crop, or the remembered answer if the same binarized crop was read before.
+    The key is the crop packed to 1 bit per pixel (so it has to be thresholded already) plus options.
+    '''
+    bits = np.packbits(np.asarray(image) > 127)
+    key = (options, image.shape, bits.tobytes())
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            memo_stats["hits"] += 1
+            return _memo[key]
+        memo_stats["misses"] += 1
+    text = compute()
+    with _memo_lock:
+        _memo[key] = text
+        _memo.move_to_end(key)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+            memo_stats["evictions"] += 1
+    return text
+
+def clear_memo() -> None:
+    with _memo_lock:
+        _memo.clear()
+
+def get_memo_stats() -> dict:
+    total = memo_stats["hits"] + memo_stats["misses"]
+    return {
+        **memo_stats,
+        "size": len(_memo),
+        "hit_rate": memo_stats["hits"] / total if total else 0.0,
+    }
+
+def read(image: np.ndarray, whitelist: str | None = None, psm: int = PSM_SINGLE_LINE, memo: bool = True) -> str:
+    '''
+    image: thresholded 2D crop
+    memo: skip the engine when this exact crop was already read with the same options
+    '''
+    if not memo:
+        return get_engine().read(image, whitelist=whitelist, psm=psm)
+    return memoized(image, ("ocr", whitelist, psm), lambda: get_engine().read(image, whitelist=whitelist, psm=psm))
+
+def compose(images: list[np.ndarray]) -> np.ndarray:
+    '''
+    Stacks binary crops top to bottom, left aligned, BATCH_GAP blank rows apart
+    '''
+    width = max(image.shape[1] for image in images) + BATCH_PAD * 2
+    height = sum(image.shape[0] for image in images) + BATCH_GAP * (len(images) - 1) + BATCH_PAD * 2
+    composite = np.zeros((height, width), dtype=np.uint8)
+    top = BATCH_PAD
+    for image in images:
+        composite[top:top + image.shape[0], BATCH_PAD:BATCH_PAD + image.shape[1]] = image
+        top += image.shape[0] + BATCH_GAP
+    return composite
+
+def read_batch(images: dict[str, np.ndarray], whitelist: str | None = None) -> dict[str, str]:
+    '''
+    Reads several thresholded crops with one engine call: they're stacked into one image,
+    read as a block and the lines are handed back in order. Blank crops are "" without being sent.
+    If tesseract doesn't return one line per crop, each crop is read on its own instead.
+    Returns {name: text}
+    '''
+    results = {name: "" for name in images}
+    inked = [(name, image) for name, image in images.items() if (image > 127).any()]
+    batch_stats["fields"] += len(images)
+    if not inked:
+        return results
+    if len(inked) == 1:
+        name, image = inked[0]
+        results[name] = read(image, whitelist=whitelist).strip()
+        return results
+    batch_stats["batches"] += 1
+    composite = compose([image for _, image in inked])
+    text = memoized(composite, ("batch", whitelist), lambda: get_engine().read(composite, whitelist=whitelist, psm=PSM_BLOCK))
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if len(lines) == len(inked):
+        for (name, _), line in zip(inked, lines):
+            results[name] = line
+    else:
+        batch_stats["fallbacks"] += 1
+        for name, image in inked:
+            results[name] = read(image, whitelist=whitelist).strip()
+    return results
+
+def read_many(regions: dict[str, tuple[int, int, int, int]], whitelist: str | None = None, threshold: int = 230, scale: int = 2) -> dict[str, str]:
+    '''
+    regions: {name: (x1,y1,x2,y2)} like screenshot_region
+    Grabs the box around all of them once, preprocesses each like get_wave and reads them in one read_batch
+    '''
+    left = min(bbox[0] for bbox in regions.values())
+    top = min(bbox[1] for bbox in regions.values())
+    right = max(bbox[2] for bbox in regions.values())
+    bottom = max(bbox[3] for bbox in regions.values())
+    screen = ct.grab(bbox=(left, top, right, bottom))
+    images = {}
+    for name, bbox in regions.items():
+        pre = preprocessor(bbox, threshold, scale)
+        with pre.lock:
+            images[name] = pre.process(screen[bbox[1] - top:bbox[3] - top, bbox[0] - left:bbox[2] - left]).copy()
+    return read_batch(images, whitelist)
+
+def get_batch_stats() -> dict:
+    return {
+        **batch_stats,
+        "fields_per_call": batch_stats["fields"] / batch_stats["batches"] if batch_stats["batches"] else 0.0,
+    }
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+from collections import deque
+from Tools import inputTools as inp
+
+# Movement paths as data, ex: PATHS.area_4 in Winter_Event.json
+#   {"press": "v"}                 tap a key ("times": n for more than one)
+#   {"hold": "a", "for": 3}        hold a key (or a list of keys) for that many seconds
+#   {"wait": 1.5}                  do nothing for that many seconds
+#   {"down": "a"} / {"up": "a"}    key down/up on its own, for overlapping keys in recorded paths
+#   {"click": [x, y], "button": "right"}   click (right click = click to move)
+# A path can also be saved as its own file in Settings/Paths (what Utility/mouseDebugging.py records),
+# PATHS can then point at it by name: "area_3": "area_3_recorded"
+# Every duration is timed against perf_counter deadlines: sleep until just before, then spin the rest,
+# so a hold lasts what it says instead of whatever time.sleep overshoots by.
+
+Paths_Path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Settings", "Paths")
+
+SPIN = 0.015 # last seconds of every wait are busy-waited (covers the old 15.6ms windows timer)
+HISTORY_SIZE = 50 # runs kept in history
+LOG_TOLERANCE = 0.005 # holds off by more than this get printed by run(log=True), a ms or two is normal jitter
+
+history = deque(maxlen=HISTORY_SIZE) # {"name", "started", "steps": [(step, intended, actual)]}
+
+def sleep_until(deadline: float) -> None:
+    remaining = deadline - time.perf_counter()
+    if remaining > SPIN:
+        time.sleep(remaining - SPIN)
+    while time.perf_counter() < deadline:
+        pass
+
+def validate(steps: list) -> list[str]:
+    '''
+    Returns the problems in a path (empty if it's fine)
+    '''
+    problems = []
+    if not isinstance(steps, list):
+        return ["path has to be a list of steps"]
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            problems.append(f"step {i}: has to be an object")
+        elif "press" in step:
+            if not isinstance(step.get("times", 1), int) or step.get("times", 1) < 1:
+                problems.append(f"step {i}: times has to be a positive whole number")
+        elif "hold" in step:
+            if not isinstance(step.get("for"), (int, float)) or step["for"] < 0:
+                problems.append(f"step {i}: hold needs \"for\": seconds")
+        elif "wait" in step:
+            if not isinstance(step["wait"], (int, float)) or step["wait"] < 0:
+                problems.append(f"step {i}: wait has to be seconds")
+        elif "down" in step or "up" in step:
+            pass
+        elif "click" in step:
+            if not isinstance(step["click"], list) or len(step["click"]) != 2:
+                problems.append(f"step {i}: click needs [x, y]")
+        else:
+            problems.append(f"step {i}: unknown step {step}")
+    return problems
+
+def load(name: str) -> list:
+    '''
+    Steps saved in Settings/Paths/<name>.json
+    '''
+    with open(os.path.join(Paths_Path, f"{name}.json"), "r") as f:
+        return json.load(f)
+
+def save(name: str, steps: list) -> str:
+    '''
+    Writes steps to Settings/Paths/<name>.json (one step per line so diffs stay readable), returns the file
+    '''
+    os.makedirs(Paths_Path, exist_ok=True)
+    file = os.path.join(Paths_Path, f"{name}.json")
+    with open(file, "w") as f:
+        f.write("[\n" + ",\n".join("    " + json.dumps(step) for step in steps) + "\n]\n")
+    return file
+
+def resolve(steps) -> list:
+    '''
+    A path from PATHS: the steps themselves, or the name of a saved path file
+    '''
+    return load(steps) if isinstance(steps, str) else steps
+
+def run(steps: list, name: str = "path", log: bool = True) -> list[tuple[str, float, float]]:
+    '''
+    Plays a path, returns [(step, intended seconds, actual seconds)] for every hold and wait.
+    log: print the holds that were off by more than LOG_TOLERANCE seconds
+    '''
+    timings = []
+    started = time.perf_counter()
+    for step in steps:
+        if "press" in step:
+            inp.press(step["press"], step.get("times", 1))
+        elif "hold" in step:
+            keys = step["hold"] if isinstance(step["hold"], list) else [step["hold"]]
+            inp.send([("key_down", key) for key in keys])
+            start = time.perf_counter()
+            sleep_until(start + step["for"])
+            actual = time.perf_counter() - start
+            inp.send([("key_up", key) for key in keys])
+            inp.count_wait(actual)
+            timings.append(("hold " + "+".join(keys), step["for"], actual))
+        elif "wait" in step:
+            start = time.perf_counter()
+            sleep_until(start + step["wait"])
+            inp.count_wait(time.perf_counter() - start)
+            timings.append(("wait", step["wait"], time.perf_counter() - start))
+        elif "down" in step:
+            inp.key_down(step["down"])
+        elif "up" in step:
+            inp.key_up(step["up"])
+        elif "click" in step:
+            inp.click(step["click"][0], step["click"][1], step.get("button", "left"))
+    history.append({"name": name, "started": started, "steps": timings})
+    if log:
+        off = [f"{label} {actual:.3f}/{intended:.3f}s" for label, intended, actual in timings if label != "wait" and abs(actual - intended) > LOG_TOLERANCE]
+        if off:
+            print(f"{name}: holds off target (actual/intended) {', '.join(off)}")
+    return timings
+
+def get_stats() -> dict:
+    '''
+    Worst and average hold error (seconds) over the recorded runs
+    '''
+    errors = [abs(actual - intended) for run_ in history for label, intended, actual in run_["steps"] if label != "wait"]
+    return {
+        "runs": len(history),
+        "holds": len(errors),
+        "avg_error": sum(errors) / len(errors) if errors else 0.0,
+        "max_error": max(errors) if errors else 0.0,
+    }
@@ -0,0 +1,78 @@
+import numpy as np
+from Tools import visionTools as vt
+
+# Named pixel checks ("is the unit panel open", "is the loss screen up", ...)
+# All registered checks are read from one grab and compared together with numpy.
+
+SIGNATURES = {} # name -> {"pos": (x, y), "colors": [((r,g,b), tolerance), ...]}
+_tables = {} # tuple of names -> precomputed arrays for evaluate
+
+def register(name: str, pos: tuple[int, int], color: tuple[int, int, int] | list, tolerance: int = 0) -> None:
+    '''
+    pos: screen (x,y)
+    color: expected (r,g,b), or a list of ((r,g,b), tolerance) where any of them counts as a match
+    '''
+    if isinstance(color, list):
+        colors = [(tuple(c), int(t)) for c, t in color]
+    else:
+        colors = [(tuple(color), int(tolerance))]
+    SIGNATURES[name] = {"pos": (int(pos[0]), int(pos[1])), "colors": colors}
+    _tables.clear()
+
+def _table(names: tuple[str, ...]) -> dict:
+    table = _tables.get(names)
+    if table is None:
+        xs, ys, expected, tolerance, starts = [], [], [], [], []
+        for name in names:
+            sig = SIGNATURES[name]
+            starts.append(len(xs))
+            for color, tol in sig["colors"]:
+                xs.append(sig["pos"][0])
+                ys.append(sig["pos"][1])
+                expected.append(color)
+                tolerance.append(tol)
+        table = {
+            "xs": np.array(xs, dtype=np.intp),
+            "ys": np.array(ys, dtype=np.intp),
+            "expected": np.array(expected, dtype=np.int16),
+            "tolerance": np.array(tolerance, dtype=np.int16)[:, None],
+            "starts": np.array(starts, dtype=np.intp),
+            "region": (min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1),
+        }
+        _tables[names] = table
+    return table
+
+def region(names: list[str] | None = None) -> tuple[int, int, int, int]:
+    '''
+    Smallest (x,y,width,height) that covers the given signatures, grab this once to evaluate them all
+    '''
+    return _table(tuple(SIGNATURES) if names is None else tuple(names))["region"]
+
+def evaluate(names: list[str] | None = None, frame: vt.Frame | None = None) -> dict[str, bool]:
+    '''
+    Checks every signature in names (all registered if None) against one frame.
+    Returns {name: matched}
+    '''
+    names = tuple(SIGNATURES) if names is None else tuple(names)
+    if not names:
+        return {}
+    table = _table(names)
+    if frame is None:
+        frame = vt.Frame.capture(table["region"])
+    xs = table["xs"] - frame.origin[0]
+    ys = table["ys"] - frame.origin[1]
+    height, width = frame.image.shape[:2]
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    pixels = frame.image[np.clip(ys, 0, height - 1), np.clip(xs, 0, width - 1)][:, ::-1].astype(np.int16) # BGR -> RGB
+    ok = (np.abs(pixels - table["expected"]) <= table["tolerance"]).all(axis=1) & inside
+    matched = np.logical_or.reduceat(ok, table["starts"])
+    return dict(zip(names, matched.tolist()))
+
+def which(names: list[str] | None = None, frame: vt.Frame | None = None) -> set[str]:
+    '''
+    Names of the signatures that are currently true
+    '''
+    return {name for name, matched in evaluate(names, frame).items() if matched}
+
+def check(name: str, frame: vt.Frame | None = None) -> bool:
+    return evaluate([name], frame)[name]
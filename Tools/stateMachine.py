@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from Tools import waitTools as wait
+
+# Named states for a long flow (the match in Winter_Event). Every state has an entry check, a time limit,
+# a retry count and where to go next / when it keeps failing. The current state and its data are written
+# to a checkpoint json on every transition so a relaunch can pick up where it was instead of starting over.
+
+ENTRY_WAIT = 10.0 # seconds a state's entry check gets to come true
+HISTORY_SIZE = 100 # transitions kept in history
+
+class StateTimeout(TimeoutError):
+    '''
+    Raised by StateMachine.check() when the running state went over its timeout
+    '''
+    def __init__(self, state: str, timeout: float, elapsed: float):
+        super().__init__(f"State {state} timed out after {elapsed:.1f}s (limit {timeout:g}s)")
+        self.state = state
+        self.timeout = timeout
+        self.elapsed = elapsed
+
+class State:
+    '''
+    run(): does the state's work, can return the name of the next state to override next
+    next: state that follows (None ends the machine)
+    check(): has to come true within entry_wait seconds (default ENTRY_WAIT) before run() starts, None = no check
+    timeout: seconds the state may take, enforced wherever run() calls machine.check()
+    retries: extra attempts after a timeout/error before going to on_fail
+    on_fail: state to go to once the retries are used up (None = raise)
+    '''
+    def __init__(self, name: str, run, next: str | None = None, check=None, timeout: float | None = None,
+                 retries: int = 0, on_fail: str | None = None, entry_wait: float = ENTRY_WAIT):
+        self.name = name
+        self.run = run
+        self.next = next
+        self.check = check
+        self.timeout = timeout
+        self.retries = retries
+        self.on_fail = on_fail
+        self.entry_wait = entry_wait
+
+class Checkpoint:
+    '''
+    {"state", "saved" (unix time), "data", ...extra} in a json file, written atomically
+    '''
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> dict | None:
+        try:
+            if os.path.isfile(self.path):
+                with open(self.path, "r") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Failed to load checkpoint: {e}")
+        return None
+
+    def save(self, state: str, data: dict, **extra) -> None:
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                temp = self.path + ".tmp"
+                with open(temp, "w") as f:
+                    json.dump({"state": state, "saved": time.time(), "data": data, **extra}, f, indent=4)
+                os.replace(temp, self.path) # a crash mid write can't leave half a checkpoint
+        except Exception as e:
+            print(f"Failed to save checkpoint: {e}")
+
+    def clear(self) -> None:
+        try:
+            with self._lock:
+                if os.path.isfile(self.path):
+                    os.remove(self.path)
+        except Exception as e:
+            print(f"Failed to clear checkpoint: {e}")
+
+class StateMachine:
+    '''
+    checkpoint: where the current state is saved, None = don't save
+    paused(): while truthy no new state starts (ex: lambda: not g_toggle)
+    extra(): more fields for the checkpoint (ex: the wave it was saved at)
+    on_retry(state): runs before a failed state is tried again, to get back to where it expects to start
+    '''
+    def __init__(self, states: list[State], checkpoint: Checkpoint | None = None, paused=None, extra=None, on_retry=None):
+        self.states = {state.name: state for state in states}
+        self.checkpoint = checkpoint
+        self.paused = paused
+        self.extra = extra
+        self.on_retry = on_retry
+        self.data = {} # survives relaunches through the checkpoint, states keep their progress in here
+        self.current = None
+        self.started = 0.0
+        self.deadline = None
+        self.history = deque(maxlen=HISTORY_SIZE) # (state, seconds, outcome)
+
+    def check(self) -> None:
+        '''
+        Call inside long loops, raises StateTimeout once the current state is over its time
+        '''
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise StateTimeout(self.current, self.states[self.current].timeout, time.perf_counter() - self.started)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def save(self) -> None:
+        '''
+        Writes the current state and data, call after progress inside a state worth keeping
+        '''
+        if self.checkpoint is not None and self.current is not None:
+            self.checkpoint.save(self.current, self.data, **(self.extra() if self.extra else {}))
+
+    def run(self, start: str, data: dict | None = None) -> None:
+        '''
+        Runs states from start until one has no next state
+        '''
+        if data is not None:
+            self.data = data
+        name = start
+        attempts = 0
+        while name is not None:
+            state = self.states[name]
+            while self.paused is not None and self.paused():
+                time.sleep(0.5)
+            self.current = name
+            self.deadline = None
+            self.save()
+            self.started = time.perf_counter()
+            try:
+                if state.check is not None:
+                    wait.wait_for(state.check, timeout=state.entry_wait, max_interval=0.5, name=f"{name} entry")
+                if state.timeout is not None:
+                    self.deadline = time.perf_counter() + state.timeout
+                following = state.run() or state.next
+            except Exception as e:
+                self.deadline = None
+                self.history.append((name, time.perf_counter() - self.started, f"failed: {e}"))
+                attempts += 1
+                if attempts <= state.retries:
+                    print(f"{name} failed ({e}), retry {attempts}/{state.retries}")
+                    if self.on_retry is not None:
+                        try:
+                            self.on_retry(name)
+                        except Exception as retry_error:
+                            print(f"Recovery before retrying {name} failed: {retry_error}")
+                    continue
+                if state.on_fail is None:
+                    raise
+                print(f"{name} failed ({e}), going to {state.on_fail}")
+                name = state.on_fail
+                attempts = 0
+                continue
+            self.deadline = None
+            self.history.append((name, time.perf_counter() - self.started, "done"))
+            print(f"{name} done in {time.perf_counter() - self.started:.1f}s -> {following}")
+            name = following
+            attempts = 0
+        self.current = None
+
+    def get_stats(self) -> dict:
+        '''
+        Per state: how often it ran, failed and the average seconds it took
+        '''
+        stats = {}
+        for name, seconds, outcome in self.history:
+            entry = stats.setdefault(name, {"runs": 0, "failures": 0, "total": 0.0})
+            entry["runs"] += 1
+            entry["failures"] += outcome != "done"
+            entry["total"] += seconds
+        for entry in stats.values():
+            entry["avg"] = entry.pop("total") / entry["runs"]
+        return stats
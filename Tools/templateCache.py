@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+import numpy as np
+import cv2
+
+Resources_Path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Resources")
+
+# Launcher art that lives in Resources but is never matched against the screen
+GUI_IMAGES = {"start.png", "ui_background.png", "image1.png", "image2.png", "image3.png", "image4.png"}
+
+_templates = {} # key -> {"color": BGR array, "gray": gray array}
+_scaled = {} # (key, grayscale, scale) -> downscaled template
+_lock = threading.Lock()
+stats = {
+    "hits": 0, # served from memory
+    "misses": 0, # had to go to disk (or file missing)
+    "loaded": 0, # templates decoded so far
+    "load_time": 0.0, # seconds spent reading + decoding
+}
+
+def template_key(name: str) -> str:
+    '''
+    Normalizes "Winter\\Full_Bar.png" / "Winter/Full_Bar.png" to one key
+    '''
+    return name.replace("\\", "/").strip("/")
+
+def template_path(name: str) -> str:
+    return os.path.join(Resources_Path, *template_key(name).split("/"))
+
+def _read_image(path: str):
+    # np.fromfile + imdecode so paths with non ascii characters still load on windows
+    data = np.fromfile(path, dtype=np.uint8)
+    if data.size == 0:
+        return None
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+def _load(key: str):
+    path = template_path(key)
+    if not os.path.isfile(path):
+        return None
+    start = time.perf_counter()
+    color = _read_image(path)
+    if color is None:
+        return None
+    entry = {
+        "color": color,
+        "gray": cv2.cvtColor(color, cv2.COLOR_BGR2GRAY),
+    }
+    stats["load_time"] += time.perf_counter() - start
+    stats["loaded"] += 1
+    return entry
+
+def load_all() -> int:
+    '''
+    Loads every template in Resources into memory, call once at startup.
+    Returns the number of templates loaded.
+    '''
+    count = 0
+    for root, _, files in os.walk(Resources_Path):
+        for file in files:
+            if not file.lower().endswith(".png") or file in GUI_IMAGES:
+                continue
+            key = template_key(os.path.relpath(os.path.join(root, file), Resources_Path))
+            with _lock:
+                if key in _templates:
+                    continue
+                entry = _load(key)
+                if entry is not None:
+                    _templates[key] = entry
+                    count += 1
+    return count
+
+def get(name: str, grayscale: bool):
+    '''
+    Returns the template as a numpy array (gray or BGR), None if the file doesn't exist.
+    Templates that weren't there at startup (ex: YOUR_MOVE.png) are loaded on first use.
+    '''
+    key = template_key(name)
+    entry = _templates.get(key)
+    if entry is not None:
+        stats["hits"] += 1
+    else:
+        stats["misses"] += 1
+        with _lock:
+            entry = _templates.get(key)
+            if entry is None:
+                entry = _load(key)
+                if entry is None:
+                    return None
+                _templates[key] = entry
+    return entry["gray"] if grayscale else entry["color"]
+
+def get_scaled(name: str, grayscale: bool, scale: float):
+    '''
+    Template shrunk by scale (for pyramid matching), cached after the first resize
+    '''
+    key = (template_key(name), grayscale, scale)
+    scaled = _scaled.get(key)
+    if scaled is None:
+        template = get(name, grayscale)
+        if template is None:
+            return None
+        scaled = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        _scaled[key] = scaled
+    return scaled
+
+def clear() -> None:
+    with _lock:
+        _templates.clear()
+        _scaled.clear()
+
+def get_stats() -> dict:
+    total = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "cached": len(_templates),
+        "hit_rate": stats["hits"] / total if total else 0.0,
+    }
@@ -0,0 +1,225 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import cv2
+from Tools import templateCache as tc
+from Tools import captureTools as ct
+
+PYRAMID_SCALE = 0.5 # Coarse level for pyramid matching
+PYRAMID_MIN_SIZE = 8 # Templates smaller than this (after shrinking) fall back to a normal search
+PYRAMID_CANDIDATES = 5 # Coarse peaks that get checked at full size
+PYRAMID_MARGIN = 2 # Extra full size pixels searched around each peak
+
+# Frame difference gating: if the searched crop looks the same as last time, reuse the last match result.
+# Opt in per call (gate=True) for idle polling loops only: small changes (a button changing color, a small icon
+# in a big region) can disappear in the thumbnail, so state checks should always match for real.
+DIFF_GATE = True # master switch for the call sites that opt in
+GATE_CELL = 8 # Crops are shrunk to one value per GATE_CELL x GATE_CELL block before comparing
+GATE_THRESHOLD = 2.0 # Largest block change (0-255) that still counts as unchanged
+GATE_CACHE_SIZE = 256
+
+_gate_cache = OrderedDict() # least recently used first, (template, grayscale, pyramid, origin, shape) -> (thumbnail, (score, loc))
+_gate_lock = threading.Lock()
+gate_stats = {"checks": 0, "skips": 0}
+
+def get_gate_stats() -> dict:
+    '''
+    How much matchTemplate work the diff gate saved
+    '''
+    checks = gate_stats["checks"]
+    return {
+        **gate_stats,
+        "cached": len(_gate_cache),
+        "skip_rate": gate_stats["skips"] / checks if checks else 0.0,
+    }
+
+def clear_gate_cache() -> None:
+    with _gate_lock:
+        _gate_cache.clear()
+
+def region_to_bbox(region: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+    '''
+    pyautogui style region (left, top, width, height) -> bbox (left, top, right, bottom)
+    '''
+    left, top, width, height = region
+    return (left, top, left + width, top + height)
+
+class Frame:
+    '''
+    One screen grab that can answer many template and pixel checks.
+    All coordinates going in and out are screen coordinates.
+    '''
+    def __init__(self, image: np.ndarray, origin: tuple[int, int] = (0, 0), timestamp: float | None = None):
+        self.image = image # BGR
+        self.origin = origin
+        self.timestamp = time.perf_counter() if timestamp is None else timestamp
+        self._gray = None
+        self._pyramid = {}
+        self._thumbs = {}
+
+    @classmethod
+    def capture(cls, region: tuple[int, int, int, int] | None = None) -> "Frame":
+        '''
+        Region: (left, top, width, height), None grabs the whole screen
+        The timestamp is from before the grab, so a frame stamped after an action really shows the screen after it
+        '''
+        started = time.perf_counter()
+        if region is None:
+            return cls(ct.grab(), (0, 0), started)
+        bbox = region_to_bbox(region)
+        return cls(ct.grab(bbox), (bbox[0], bbox[1]), started)
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None: # Only convert once no matter how many gray checks run on this frame
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return (self.image.shape[1], self.image.shape[0])
+
+    def covers(self, region: tuple[int, int, int, int] | None) -> bool:
+        '''
+        True if region (None = whole screen) is fully inside this frame
+        '''
+        ox, oy = self.origin
+        width, height = self.size
+        if region is None:
+            return (ox, oy) == (0, 0)
+        left, top, right, bottom = region_to_bbox(region)
+        return left >= ox and top >= oy and right <= ox + width and bottom <= oy + height
+
+    def view(self, region: tuple[int, int, int, int] | None, grayscale: bool):
+        '''
+        Returns (array, (left, top)) for the part of the frame inside region, clipped to the frame
+        '''
+        src = self.gray if grayscale else self.image
+        if region is None:
+            return src, self.origin
+        ox, oy = self.origin
+        left, top, right, bottom = region_to_bbox(region)
+        x0 = min(max(left - ox, 0), src.shape[1])
+        y0 = min(max(top - oy, 0), src.shape[0])
+        x1 = min(max(right - ox, x0), src.shape[1])
+        y1 = min(max(bottom - oy, y0), src.shape[0])
+        return src[y0:y1, x0:x1], (x0 + ox, y0 + oy)
+
+    def match(self, name: str, grayscale: bool, region: tuple | None = None, pyramid: bool = False, gate: bool = False):
+        '''
+        Best match for the template anywhere in region.
+        pyramid: search a half size copy first and only check around the best spots at full size
+        gate: reuse the last result for this template + region if the crop hasn't changed (see DIFF_GATE)
+        Returns (score, (left, top, width, height)) or None if the template can't be searched here.
+        '''
+        template = tc.get(name, grayscale)
+        if template is None:
+            return None
+        haystack, (ox, oy) = self.view(region, grayscale)
+        th, tw = template.shape[:2]
+        if haystack.shape[0] < th or haystack.shape[1] < tw:
+            return None
+        gate = gate and DIFF_GATE
+        if gate:
+            gate_key = (tc.template_key(name), grayscale, pyramid, ox, oy, haystack.shape)
+            thumb = self._thumbnail(haystack, grayscale, region)
+            with _gate_lock:
+                gate_stats["checks"] += 1
+                cached = _gate_cache.get(gate_key)
+                if cached is not None:
+                    _gate_cache.move_to_end(gate_key)
+                    if float(cv2.absdiff(cached[0], thumb).max()) <= GATE_THRESHOLD:
+                        gate_stats["skips"] += 1
+                        score, loc = cached[1]
+                        return score, (loc[0] + ox, loc[1] + oy, tw, th)
+        found = None
+        if pyramid:
+            found = self._match_pyramid(name, template, haystack, grayscale, region)
+        if found is None:
+            result = cv2.matchTemplate(haystack, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, loc = cv2.minMaxLoc(result)
+            found = (score, loc)
+        if gate:
+            with _gate_lock:
+                _gate_cache[gate_key] = (thumb, found)
+                _gate_cache.move_to_end(gate_key)
+                while len(_gate_cache) > GATE_CACHE_SIZE:
+                    _gate_cache.popitem(last=False)
+        score, loc = found
+        return score, (loc[0] + ox, loc[1] + oy, tw, th)
+
+    def _thumbnail(self, haystack: np.ndarray, grayscale: bool, region: tuple | None) -> np.ndarray:
+        '''
+        One value per GATE_CELL block, cached so every template checked on this crop shares it
+        '''
+        key = (grayscale, tuple(region) if region is not None else None)
+        thumb = self._thumbs.get(key)
+        if thumb is None:
+            size = (max(haystack.shape[1] // GATE_CELL, 1), max(haystack.shape[0] // GATE_CELL, 1))
+            thumb = cv2.resize(haystack, size, interpolation=cv2.INTER_AREA)
+            self._thumbs[key] = thumb
+        return thumb
+
+    def _pyramid_level(self, haystack: np.ndarray, grayscale: bool, region: tuple | None) -> np.ndarray:
+        key = (grayscale, tuple(region) if region is not None else None)
+        small = self._pyramid.get(key)
+        if small is None: # Shared by every pyramid search on this frame + region
+            small = cv2.resize(haystack, None, fx=PYRAMID_SCALE, fy=PYRAMID_SCALE, interpolation=cv2.INTER_AREA)
+            self._pyramid[key] = small
+        return small
+
+    def _match_pyramid(self, name: str, template: np.ndarray, haystack: np.ndarray, grayscale: bool, region: tuple | None):
+        '''
+        Returns (score, (x, y)) relative to haystack, None when the template is too small to shrink
+        '''
+        th, tw = template.shape[:2]
+        if min(th, tw) * PYRAMID_SCALE < PYRAMID_MIN_SIZE:
+            return None
+        small_template = tc.get_scaled(name, grayscale, PYRAMID_SCALE)
+        small = self._pyramid_level(haystack, grayscale, region)
+        sh, sw = small_template.shape[:2]
+        if small.shape[0] < sh or small.shape[1] < sw:
+            return None
+        coarse = cv2.matchTemplate(small, small_template, cv2.TM_CCOEFF_NORMED)
+        best = None
+        margin = int(round(1 / PYRAMID_SCALE)) + PYRAMID_MARGIN
+        for _ in range(PYRAMID_CANDIDATES):
+            _, _, _, loc = cv2.minMaxLoc(coarse)
+            # Knock out this peak so the next pass finds a different spot
+            cx, cy = loc
+            coarse[max(cy - sh // 2, 0):cy + sh // 2 + 1, max(cx - sw // 2, 0):cx + sw // 2 + 1] = -1
+            # Exact score at full size around the candidate
+            x = int(cx / PYRAMID_SCALE)
+            y = int(cy / PYRAMID_SCALE)
+            x0, y0 = max(x - margin, 0), max(y - margin, 0)
+            x1 = min(x + margin + tw, haystack.shape[1])
+            y1 = min(y + margin + th, haystack.shape[0])
+            window = haystack[y0:y1, x0:x1]
+            if window.shape[0] < th or window.shape[1] < tw:
+                continue
+            result = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, fine = cv2.minMaxLoc(result)
+            if best is None or score > best[0]:
+                best = (score, (fine[0] + x0, fine[1] + y0))
+        return best
+
+    def pixel(self, x: int, y: int) -> tuple[int, int, int]:
+        '''
+        Same as pyautogui.pixel, returns (r,g,b)
+        Raises IndexError for a pixel outside the frame (numpy would wrap negative offsets to the other edge)
+        '''
+        if not self.covers((x, y, 1, 1)):
+            raise IndexError(f"Pixel ({x}, {y}) is outside the frame at {self.origin} of size {self.size}")
+        b, g, r = self.image[y - self.origin[1], x - self.origin[0]]
+        return (int(r), int(g), int(b))
+
+    def pixel_matches(self, x: int, y: int, expected: tuple[int, int, int], tolerance: int = 0) -> bool:
+        '''
+        Same as pyautogui.pixelMatchesColor
+        '''
+        r, g, b = self.pixel(x, y)
+        return abs(r - expected[0]) <= tolerance and abs(g - expected[1]) <= tolerance and abs(b - expected[2]) <= tolerance
+
+def center(box: tuple[int, int, int, int]) -> tuple[int, int]:
+    return (box[0] + box[2] // 2, box[1] + box[3] // 2)
@@ -0,0 +1,50 @@
+import time
+
+class WaitTimeout(TimeoutError):
+    '''
+    Raised by wait_for when the condition never came true
+    '''
+    def __init__(self, name: str, timeout: float, elapsed: float, ticks: int):
+        super().__init__(f"Timed out waiting for {name} after {elapsed:.2f}s ({ticks} ticks)")
+        self.name = name
+        self.timeout = timeout
+        self.elapsed = elapsed
+        self.ticks = ticks
+
+def wait_for(condition, timeout: float | None = None, poll_interval: float = 0.05, backoff: float = 1.5, max_interval: float = 1.0,
+             on_tick=None, tick_interval: float | None = None, cancel=None, name: str | None = None) -> float | None:
+    '''
+    Polls condition() until it's truthy and returns how many seconds that took.
+    poll_interval: first wait between polls, multiplied by backoff after every miss up to max_interval
+    on_tick(ticks, elapsed): called between polls (press e, re-click, ...), polling goes back to fast right after it
+    tick_interval: minimum seconds between on_tick calls, None = every poll
+    cancel(): stop waiting and return None when this is truthy (ex: lambda: not g_toggle)
+    Raises WaitTimeout after timeout seconds (None waits forever).
+    '''
+    name = name or getattr(condition, "__name__", "condition")
+    start = time.perf_counter()
+    deadline = None if timeout is None else start + timeout
+    interval = poll_interval
+    ticks = 0
+    last_tick = start
+    while True:
+        if condition():
+            return time.perf_counter() - start
+        now = time.perf_counter()
+        if cancel is not None and cancel():
+            return None
+        if deadline is not None and now >= deadline:
+            raise WaitTimeout(name, timeout, now - start, ticks)
+        if on_tick is not None and (tick_interval is None or now - last_tick >= tick_interval):
+            ticks += 1
+            on_tick(ticks, now - start)
+            last_tick = time.perf_counter()
+            interval = poll_interval # something just happened, look again soon
+        else:
+            interval = min(interval * backoff, max_interval)
+        sleep_for = interval
+        if deadline is not None:
+            sleep_for = min(sleep_for, max(deadline - time.perf_counter(), 0))
+        if on_tick is not None and tick_interval is not None:
+            sleep_for = min(sleep_for, max(last_tick + tick_interval - time.perf_counter(), 0))
+        time.sleep(sleep_for)
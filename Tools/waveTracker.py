@@ -0,0 +1,153 @@
+import time
+import threading
+from Tools import avMethods as avM
+from Tools import waitTools as wait
+
+# Reads the wave counter on its own thread so the match loop just asks current() instead of running OCR inline.
+# Readings are filtered: misreads (-1/None), waves going backwards and big jumps are only accepted once
+# CONFIRM_READS readings in a row agree, so one bad OCR can't trigger repair_barricades or a lane buy.
+
+MAX_STEP = 2 # waves the counter can move forward between two readings without needing confirmation
+CONFIRM_READS = 2 # matching readings needed to accept anything unexpected (restart to 0, first read, ...)
+
+class WaveTracker:
+    '''
+    interval: seconds between reads
+    read: function returning the wave (avM.get_wave), -1/None for a failed read
+    '''
+    def __init__(self, interval: float = 0.5, read=None):
+        self.interval = interval
+        self.read = read or avM.get_wave
+        self.wave = None # last accepted wave, None until the first one is confirmed
+        self.changed_at = 0.0 # perf_counter time the wave last changed
+        self.stats = {"reads": 0, "accepted": 0, "failed": 0, "rejected": 0}
+        self._callbacks = []
+        self._pending = None # unexpected value waiting for confirmation
+        self._pending_count = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "WaveTracker":
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="WaveTracker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.update(self.read())
+            except Exception as e:
+                print(f"Wave tracker failed to read: {e}")
+            self._stop.wait(self.interval)
+
+    def update(self, value) -> bool:
+        '''
+        Feeds one reading through the filter, returns True if the wave changed
+        '''
+        self.stats["reads"] += 1
+        if value is None or value < 0:
+            self.stats["failed"] += 1
+            return False
+        with self._cond:
+            old = self.wave
+            if old is not None and old <= value <= old + MAX_STEP:
+                self._pending, self._pending_count = None, 0
+            else:
+                # Backwards, too far ahead or nothing to compare with, needs the same reading again
+                if value == self._pending:
+                    self._pending_count += 1
+                else:
+                    self._pending, self._pending_count = value, 1
+                if self._pending_count < CONFIRM_READS:
+                    self.stats["rejected"] += 1
+                    return False
+                self._pending, self._pending_count = None, 0
+            self.stats["accepted"] += 1
+            if value == old:
+                return False
+            self.wave = value
+            self.changed_at = time.perf_counter()
+            self._cond.notify_all()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(old, value)
+            except Exception as e:
+                print(f"Wave callback failed: {e}")
+        return True
+
+    def current(self) -> int | None:
+        '''
+        Last accepted wave, None if nothing has been confirmed yet
+        '''
+        return self.wave
+
+    def reset(self) -> None:
+        '''
+        Forget the wave (after restarting the match), the next confirmed reading is taken as is
+        '''
+        with self._cond:
+            self.wave = None
+            self._pending, self._pending_count = None, 0
+
+    def on_change(self, callback) -> None:
+        '''
+        callback(old, new) runs on the tracker thread every time the accepted wave changes
+        '''
+        self._callbacks.append(callback)
+
+    def wait_for_wave(self, wave: int, timeout: float | None = None, cancel=None) -> int | None:
+        '''
+        Blocks until the wave is at least wave and returns it.
+        cancel(): return None early when this is truthy (ex: lambda: not g_toggle)
+        Raises wait.WaitTimeout after timeout seconds (None waits forever).
+        '''
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            while self.wave is None or self.wave < wave:
+                if cancel is not None and cancel():
+                    return None
+                now = time.perf_counter()
+                if deadline is not None and now >= deadline:
+                    raise wait.WaitTimeout(f"wave {wave}", timeout, now - start, 0)
+                remaining = 0.5 if deadline is None else min(0.5, deadline - now) # wake up to check cancel
+                self._cond.wait(remaining)
+            return self.wave
+
+    def get_stats(self) -> dict:
+        reads = self.stats["reads"]
+        return {
+            **self.stats,
+            "wave": self.wave,
+            "reject_rate": (self.stats["failed"] + self.stats["rejected"]) / reads if reads else 0.0,
+        }
+
+_tracker = None
+
+def start(interval: float = 0.5) -> WaveTracker:
+    '''
+    Starts the shared tracker (or returns it if it's already running)
+    '''
+    global _tracker
+    if _tracker is None:
+        _tracker = WaveTracker(interval=interval)
+    return _tracker.start()
+
+def get() -> WaveTracker | None:
+    return _tracker
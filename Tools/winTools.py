@@ -6,6 +6,7 @@ from PIL import ImageGrab
 import numpy as np
 import cv2
 import io
+from Tools import captureTools as ct
 
 def get_window(title: str) -> gw.Win32Window:
     '''
@@ -96,13 +97,12 @@ def screen_shot_memory(window: gw.Win32Window | None = None):
 
 def screenshot_region(region: tuple[int, int]):
     '''
-    Region: Where the screenshot will be taken (x,y,width,height)
+    Region: Where the screenshot will be taken (x1,y1,x2,y2)
     Returns: NumPy array (BGR), Ment for EasyOCR and CV2 usage
+    Uses the capture backend from captureTools (win32 / pil / replay)
     '''
     try:
-        img = ImageGrab.grab(bbox=region)
-        img_np = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-        return img_np
+        return ct.grab(bbox=region)
     except Exception as e:
         print(f"Region {region} experienced an error when screenshotting : {e}")
 
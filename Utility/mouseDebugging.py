@@ -1,16 +1,39 @@
 from pyautogui import *
 import keyboard
 
+import os
+import sys
+import json
 import time
+import queue
+import argparse
+import threading
 import pyautogui
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # needed to get py tools
+from Tools import pathTools as path
+
+# z saves the mouse position + color, n stops and prints them.
+# With --record NAME it's also a path recorder: F8 starts/stops recording your keys and clicks,
+# the result is saved as Settings/Paths/NAME.json, a path run_path can play ("area_3": "NAME" in PATHS).
+# The raw timestamped events go next to it (NAME.events.jsonl), --snapshots also saves a frame at the start,
+# on every click and on F9 (NAME_frames/<ms since start>_<why>.png) so you can see where you were.
+#   python Utility/mouseDebugging.py --record area_3 [--snapshots]
 
 save_mouse_location = 'z'
 stop_key = 'n'
+record_key = 'f8'
+mark_key = 'f9'
 mouse_info2 = {}
 mouse_just_pos = []
 #Togglables
 BotOn = True
 
+PRESS_MAX = 0.06 # key down for less than this is a tap
+MIN_WAIT = 0.005 # shorter gaps are dropped
+KEY_ALIASES = {"left shift": "shift", "right shift": "shift", "left ctrl": "ctrl", "right ctrl": "ctrl",
+               "left alt": "alt", "right alt": "alt", "alt gr": "alt"}
+MOUSE_BUTTONS = {"left": 0x01, "right": 0x02, "middle": 0x04} # virtual key codes for GetAsyncKeyState
+
 def add_cords(cords):
     color = pyautogui.pixel(cords[0],cords[1])
     pos_info = {(cords.x, cords.y): color}
@@ -20,16 +43,144 @@ def add_cords(cords):
 def bot_toggle():
     global BotOn
     BotOn = not BotOn
-    
-    
 
-keyboard.add_hotkey(save_mouse_location, lambda: add_cords(pyautogui.position()))
-keyboard.add_hotkey(stop_key, bot_toggle)
+def to_steps(events: list[tuple]) -> list[dict]:
+    '''
+    Recorded (time, "key_down"/"key_up", key) and (time, "click", x, y, button) events -> path steps.
+    A key with nothing else happening while it's down becomes a hold (or a press), overlapping keys
+    become separate down/up steps, the gaps between become waits. Time before the first event is dropped.
+    '''
+    held = {}
+    actions = [] # (time, kind, ...) with auto repeat and releases of keys held before the start removed
+    for event in sorted(events, key=lambda e: e[0]):
+        kind = event[1]
+        if kind == "key_down":
+            if event[2] in held:
+                continue
+            held[event[2]] = event[0]
+        elif kind == "key_up":
+            if held.pop(event[2], None) is None:
+                continue
+        actions.append(event)
+    if actions:
+        end = actions[-1][0]
+        actions += [(end, "key_up", key) for key in held] # still down when recording stopped
+
+    steps = []
+    cursor = None
+    i = 0
+    while i < len(actions):
+        event = actions[i]
+        if cursor is not None and event[0] - cursor >= MIN_WAIT:
+            steps.append({"wait": round(event[0] - cursor, 3)})
+        cursor = event[0]
+        kind = event[1]
+        if kind == "click":
+            steps.append({"click": [event[2], event[3]], "button": event[4]})
+        elif kind == "key_down" and i + 1 < len(actions) and actions[i + 1][1:] == ("key_up", event[2]):
+            duration = actions[i + 1][0] - event[0]
+            steps.append({"press": event[2]} if duration < PRESS_MAX else {"hold": event[2], "for": round(duration, 3)})
+            cursor = actions[i + 1][0]
+            i += 1
+        elif kind == "key_down":
+            steps.append({"down": event[2]})
+        else:
+            steps.append({"up": event[2]})
+        i += 1
+    return steps
+
+class Recorder:
+    '''
+    Timestamps keys (keyboard hook) and mouse clicks (polled, there's no mouse hook in the bundle)
+    '''
+    def __init__(self, name: str, snapshots: bool = False, poll: float = 0.002):
+        self.name = name
+        self.snapshots = snapshots
+        self.poll = poll
+        self.events = []
+        self.recording = False
+        self.started = 0.0
+        self._frames = queue.Queue()
+        self._ignored = {save_mouse_location, stop_key, record_key, mark_key}
+        keyboard.hook(self._on_key)
+        threading.Thread(target=self._poll_mouse, daemon=True).start()
+        if snapshots:
+            threading.Thread(target=self._save_frames, daemon=True).start()
+
+    def _on_key(self, event):
+        name = KEY_ALIASES.get((event.name or "").lower(), (event.name or "").lower())
+        if self.recording and name and name not in self._ignored:
+            self.events.append((event.time, "key_down" if event.event_type == keyboard.KEY_DOWN else "key_up", name))
+
+    def _poll_mouse(self):
+        import ctypes
+        user32 = ctypes.windll.user32
+        was_down = {button: False for button in MOUSE_BUTTONS}
+        while BotOn:
+            for button, vk in MOUSE_BUTTONS.items():
+                down = bool(user32.GetAsyncKeyState(vk) & 0x8000)
+                if down and not was_down[button] and self.recording:
+                    x, y = pyautogui.position()
+                    self.events.append((time.time(), "click", x, y, button))
+                    self.snapshot(f"{button}_click")
+                was_down[button] = down
+            time.sleep(self.poll)
+
+    def snapshot(self, why: str) -> None:
+        if self.snapshots and self.recording:
+            self._frames.put((time.time(), why))
+
+    def _save_frames(self):
+        import cv2
+        from Tools import captureTools as ct
+        folder = os.path.join(path.Paths_Path, f"{self.name}_frames")
+        while True:
+            when, why = self._frames.get()
+            try:
+                os.makedirs(folder, exist_ok=True)
+                cv2.imwrite(os.path.join(folder, f"{int((when - self.started) * 1000):07d}_{why}.png"), ct.grab())
+            except Exception as e:
+                print(f"Couldn't save snapshot: {e}")
+
+    def toggle(self):
+        if not self.recording:
+            self.events = []
+            self.started = time.time()
+            self.recording = True
+            self.snapshot("start")
+            print(f"Recording {self.name}, {record_key} to stop")
+        else:
+            self.recording = False
+            self.save()
+
+    def save(self):
+        steps = to_steps(self.events)
+        file = path.save(self.name, steps)
+        with open(os.path.join(path.Paths_Path, f"{self.name}.events.jsonl"), "w") as f:
+            for event in self.events:
+                f.write(json.dumps({"t": round(event[0] - self.started, 6), "event": list(event[1:])}) + "\n")
+        print(f"Saved {len(steps)} steps ({len(self.events)} events) to {file}")
+        print(f"Use it with \"PATHS\": {{\"<area>\": \"{self.name}\"}} in Winter_Event.json")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mouse position/color picker and path recorder")
+    parser.add_argument("--record", metavar="NAME", help=f"record a path with {record_key}, saved as Settings/Paths/NAME.json")
+    parser.add_argument("--snapshots", action="store_true", help=f"save frames at the start, on clicks and on {mark_key}")
+    args = parser.parse_args()
 
-while BotOn:
-    time.sleep(0.1)
+    keyboard.add_hotkey(save_mouse_location, lambda: add_cords(pyautogui.position()))
+    keyboard.add_hotkey(stop_key, bot_toggle)
+    recorder = None
+    if args.record:
+        recorder = Recorder(args.record, snapshots=args.snapshots)
+        keyboard.add_hotkey(record_key, recorder.toggle)
+        keyboard.add_hotkey(mark_key, lambda: recorder.snapshot("mark"))
+        print(f"{record_key} to start recording {args.record}, {stop_key} to quit")
 
-print(f"Mouse position with color {mouse_info2}")
-print(f"Just mouse cordinates: {mouse_just_pos}")
+    while BotOn:
+        time.sleep(0.1)
 
+    if recorder is not None and recorder.recording:
+        recorder.toggle()
+    print(f"Mouse position with color {mouse_info2}")
+    print(f"Just mouse cordinates: {mouse_just_pos}")
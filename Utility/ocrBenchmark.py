@@ -0,0 +1,161 @@
+import os
+import re
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # needed to get py tools
+from Tools import ocrTools as ocr
+from Tools import glyphTools as glyph
+
+# Accuracy / latency of every OCR backend on labelled game captures in Utility/OCR_Corpus.
+#   wave/  raw BGR crops of the wave counter (what get_wave grabs)
+#   yen/   raw BGR crops of the yen counter (YEN_REGION), labelled with the number without commas/dots
+#   text/  raw BGR crops for read_region
+# Files are named <label>_<anything>.png. Take them during a match with --capture:
+#   python Utility/ocrBenchmark.py --capture wave 37
+#   python Utility/ocrBenchmark.py --capture yen 12500 --bbox x1 y1 x2 y2
+# The shipped crops are cut from real game screens already in the repo: the match screenshot Resources/image1.png
+# (wave counter, yen counter, HUD words) and the text templates in Resources/Winter (NO_YEN, TakDetect, ...),
+# the part after the label names where each came from. Add --capture crops to grow it.
+# Only real captures say anything about accuracy. synthetic/ holds OpenCV font renders (the same font the
+# default glyph set came from), --synthetic runs on them as a smoke test of the script, not as a baseline.
+# Backends that can't load (no tesseract on linux, ...) are skipped.
+#   python Utility/ocrBenchmark.py [--corpus dir] [--synthetic] [--repeat n]
+
+Corpus_Path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "OCR_Corpus")
+Synthetic_Path = os.path.join(Corpus_Path, "synthetic")
+
+KINDS = ("wave", "yen", "text")
+WAVE_BBOX = (477, 154, 605, 179) # same box as avMethods.get_wave
+YEN_CHARS = "0123456789,.KMkm" # same as avMethods.YEN_CHARS
+
+TEXT_WORDS = ["Wave", "Victory", "Defeat", "Yen", "Upgrade", "Sell", "Boss", "Monarch", "Place", "Retry"]
+
+def load_corpus(folder: str) -> list[tuple[str, np.ndarray]]:
+    crops = []
+    if not os.path.isdir(folder):
+        return crops
+    for file in sorted(os.listdir(folder)):
+        if file.lower().endswith(".png"):
+            label = re.match(r"[^_.]+", file).group(0)
+            crops.append((label, cv2.imdecode(np.fromfile(os.path.join(folder, file), dtype=np.uint8), cv2.IMREAD_COLOR)))
+    return crops
+
+def preprocess(crop: np.ndarray) -> np.ndarray:
+    # Same steps as get_wave / read_region
+    height, width = crop.shape[:2]
+    return ocr.preprocessor((0, 0, width, height)).process(crop).copy()
+
+def available_engines() -> dict:
+    engines = {}
+    blank = np.zeros((20, 40), dtype=np.uint8)
+    for name in (ocr.TesseractAPI.name, ocr.PytesseractEngine.name):
+        try:
+            engine = ocr.create_engine(name)
+            engine.read(blank) # pytesseract only finds out tesseract is missing on the first read
+            engines[name] = engine
+        except Exception as e:
+            print(f"skipping {name}: {e}")
+    return engines
+
+def backends(kind: str, engines: dict) -> dict:
+    '''
+    name -> read(binary) for this corpus kind
+    '''
+    whitelist = {"wave": ocr.DIGITS, "yen": YEN_CHARS}.get(kind, ocr.LETTERS)
+    found = {}
+    if kind in ("wave", "yen"):
+        glyph.set_enabled(True) # measured whatever GLYPH_OCR says
+        found["glyph"] = lambda image: glyph.recognize(image)[0]
+        if engines:
+            found["glyph+fallback"] = lambda image: glyph.read_digits(image, memo=False)
+    for name, engine in engines.items():
+        found[name] = lambda image, engine=engine: engine.read(image, whitelist=whitelist)
+    return found
+
+def run(read, crops: list, repeat: int, kind: str = "") -> dict:
+    images = [(label, preprocess(crop)) for label, crop in crops]
+    read(images[0][1]) # warm up
+    times = []
+    correct = 0
+    for _ in range(repeat):
+        for label, image in images:
+            start = time.perf_counter()
+            text = read(image)
+            times.append(time.perf_counter() - start)
+            text = text.strip()
+            correct += (text.replace(",", "").replace(".", "") if kind == "yen" else text) == label
+    times = np.array(times) * 1000
+    return {
+        "accuracy": correct / len(times),
+        "p50_ms": float(np.percentile(times, 50)),
+        "p99_ms": float(np.percentile(times, 99)),
+        "reads_per_s": len(times) / (times.sum() / 1000),
+    }
+
+def capture(folder: str, kind: str, label: str, bbox: tuple[int, int, int, int]) -> str:
+    '''
+    Saves what's on screen in bbox (left, top, right, bottom) as a labelled raw crop for kind
+    '''
+    from Tools import captureTools as ct
+    os.makedirs(os.path.join(folder, kind), exist_ok=True)
+    file = os.path.join(folder, kind, f"{label}_{int(time.time() * 1000)}.png")
+    cv2.imwrite(file, ct.grab(bbox))
+    return file
+
+def make_synthetic(folder: str, count: int = 60, seed: int = 7) -> None:
+    '''
+    Writes the synthetic part of the corpus: white text with a dark outline on a noisy background,
+    the same look and size as the wave counter. Real captures can sit next to these.
+    '''
+    rng = np.random.default_rng(seed)
+    for kind in ("wave", "text"):
+        os.makedirs(os.path.join(folder, kind), exist_ok=True)
+    for i in range(count):
+        for kind in ("wave", "text"):
+            label = str(int(rng.integers(1, 201))) if kind == "wave" else TEXT_WORDS[int(rng.integers(len(TEXT_WORDS)))]
+            crop = cv2.GaussianBlur(rng.integers(20, 120, (25, 128, 3), dtype=np.uint8), (5, 5), 0)
+            position = (int(rng.integers(10 if kind == "text" else 30, 40 if kind == "text" else 50)), int(rng.integers(19, 22)))
+            cv2.putText(crop, label, position, cv2.FONT_HERSHEY_DUPLEX, 0.65, (0, 0, 0), 4, cv2.LINE_AA)
+            cv2.putText(crop, label, position, cv2.FONT_HERSHEY_DUPLEX, 0.65, (255, 255, 255), 1, cv2.LINE_AA)
+            cv2.imwrite(os.path.join(folder, kind, f"{label}_s{i:03d}.png"), crop)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR accuracy/latency benchmark")
+    parser.add_argument("--corpus", default=None, help=f"default {Corpus_Path} ({Synthetic_Path} with --synthetic)")
+    parser.add_argument("--synthetic", action="store_true", help="run on the synthetic font renders (smoke test, not accuracy)")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the corpus for the timings")
+    parser.add_argument("--make-synthetic", action="store_true", help="(re)write the synthetic crops first")
+    parser.add_argument("--capture", nargs=2, metavar=("KIND", "LABEL"), help="save the screen crop for KIND (wave/yen/text) as LABEL")
+    parser.add_argument("--bbox", nargs=4, type=int, metavar=("X1", "Y1", "X2", "Y2"), help="crop for --capture (wave has a default)")
+    args = parser.parse_args()
+    corpus = args.corpus or (Synthetic_Path if args.synthetic else Corpus_Path)
+    if args.capture:
+        kind, label = args.capture
+        bbox = tuple(args.bbox) if args.bbox else (WAVE_BBOX if kind == "wave" else None)
+        if kind not in KINDS or bbox is None:
+            parser.error("--capture needs a kind of wave/yen/text and --bbox for yen and text")
+        print(capture(corpus, kind, label, bbox))
+        sys.exit(0)
+    if args.make_synthetic:
+        make_synthetic(Synthetic_Path if args.corpus is None else corpus)
+    if args.synthetic:
+        print("SYNTHETIC corpus: checks the script and backends run, the accuracy numbers are not a baseline")
+    engines = available_engines()
+    found_any = False
+    print(f"{'corpus':<6} {'backend':<16} {'crops':>5} {'accuracy':>9} {'p50 ms':>8} {'p99 ms':>8} {'reads/s':>9}")
+    for kind in KINDS:
+        crops = load_corpus(os.path.join(corpus, kind))
+        if not crops:
+            continue
+        found_any = True
+        found = backends(kind, engines)
+        if not found:
+            print(f"{kind:<6} no backend can read this corpus here")
+        for name, read in found.items():
+            result = run(read, crops, args.repeat, kind)
+            print(f"{kind:<6} {name:<16} {len(crops):>5} {result['accuracy']:>9.1%} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['reads_per_s']:>9.0f}")
+    if not found_any:
+        print(f"No labelled captures in {corpus}, take some during a match with --capture")
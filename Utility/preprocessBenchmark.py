@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import cv2
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # needed to get py tools
+from Tools import ocrTools as ocr
+
+# Compares the old get_wave preprocessing (new array every step) with ocrTools.Preprocessor.
+# Runs on a fake wave crop so it doesn't need the game: python Utility/preprocessBenchmark.py [calls]
+
+WAVE_BBOX = (477, 154, 605, 179)
+
+def fake_crop() -> np.ndarray:
+    width, height = WAVE_BBOX[2] - WAVE_BBOX[0], WAVE_BBOX[3] - WAVE_BBOX[1]
+    crop = np.random.default_rng(0).integers(20, 120, (height, width, 3), dtype=np.uint8)
+    cv2.putText(crop, "137", (40, 20), cv2.FONT_HERSHEY_DUPLEX, 0.65, (255, 255, 255), 1, cv2.LINE_AA)
+    return crop
+
+def old_pipeline(crop: np.ndarray) -> np.ndarray:
+    screenshot = crop.copy() # screenshot_region handed back a fresh array every call
+    gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
+    _, threshold = cv2.threshold(gray, 230, 255, cv2.THRESH_BINARY)
+    return cv2.resize(threshold, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+
+def measure(name: str, fn, calls: int) -> None:
+    fn() # warm up (first call makes the buffers)
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    per_call = (time.perf_counter() - start) / calls * 1e6
+    tracemalloc.start() # numpy reports its buffers to tracemalloc, so peak = bytes allocated by one call
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<24} {per_call:8.1f} us/call   {peak / 1024:7.1f} KB allocated/call")
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    crop = fake_crop()
+    cubic = ocr.Preprocessor(WAVE_BBOX)
+    nearest = ocr.Preprocessor(WAVE_BBOX, nearest=True)
+    print(f"{calls} calls on a {crop.shape[1]}x{crop.shape[0]} crop (capture not included)")
+    measure("old (fresh arrays)", lambda: old_pipeline(crop), calls)
+    measure("Preprocessor cubic", lambda: cubic.process(crop), calls)
+    measure("Preprocessor nearest", lambda: nearest.process(crop), calls)
+    same = np.array_equal(old_pipeline(crop), cubic.process(crop))
+    print(f"cubic output identical to old pipeline: {same}")
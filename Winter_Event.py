@@ -2,6 +2,15 @@
 from Tools import botTools as bt
 from Tools import winTools as wt
 from Tools import avMethods as avM
+from Tools import pixelTools as pt
+from Tools import frameProducer as fp
+from Tools import waitTools as wait
+from Tools import waveTracker
+from Tools import economyTools as eco
+from Tools import inputTools as inp
+from Tools import pathTools as path
+from Tools import stateMachine as sm
+from Tools import glyphTools as glyph
 import webhook
 import keyboard
 import time
@@ -9,8 +18,7 @@ import pyautogui
 import sys
 import os
 from datetime import datetime
-from threading import Thread
-import pydirectinput
+from threading import Thread, Event
 import ctypes
 import subprocess
 import json
@@ -61,7 +69,28 @@ else:
     
     
 print("Loaded settings")
+glyph.set_enabled(getattr(Settings, "GLYPH_OCR", True)) # still needs all ten digits in the glyph set to kick in
+for path_name, steps in getattr(Settings, "PATHS", {}).items():
+    try:
+        for problem in path.validate(path.resolve(steps)):
+            print(f"PATHS.{path_name} {problem}")
+    except Exception as e:
+        print(f"PATHS.{path_name} can't be loaded: {e}")
 Settings.Units_Placeable.append("Doom")
+
+# Pixel states, pt.evaluate/pt.which reads any number of these from one grab
+pt.register("unit_panel_open", (607, 381), (255, 255, 255))
+pt.register("upgrader_open", (1111, 310), (255, 255, 255))
+pt.register("loss", (690, 270), [((242, 25, 28), 10), ((199, 45, 40), 5)])
+pt.register("start_green", (874, 226), (8, 148, 8))
+pt.register("menu_open", (888, 269), (165, 232, 235), tolerance=30)
+pt.register("rejoin_button", (1085, 321), (255, 255, 255), tolerance=5)
+# Upgrader buttons turn dark once bought, the spot depends on the upgrade and on USE_UI_NAV
+for upgrade_name, spot, nav_spot in [("fortune", (966, 471), (960, 406)), ("range", (962, 621), (955, 562)),
+                                     ("damage", (959, 399), (954, 415)), ("speed", (957, 424), (956, 566)),
+                                     ("armor", (955, 577), (954, 561))]:
+    pt.register(f"bought_{upgrade_name}", spot, (24, 24, 24), tolerance=40)
+    pt.register(f"bought_{upgrade_name}_nav", nav_spot, (24, 24, 24), tolerance=40)
 # Failsafe key
 global g_toggle
 g_toggle = False
@@ -93,37 +122,35 @@ def click(x,y, delay: int | None=None, right_click: bool | None = None, dont_mov
         delay=delay
     else:
         delay = 0.65
+    inp.pace() # keeps the gap pyautogui.PAUSE used to add, measured from the last key press or click
     if dont_move is None:
-        pyautogui.moveTo(x,y)
-    ctypes.windll.user32.mouse_event(0x0001, 0, 1, 0, 0)
-    time.sleep(delay)
-    ctypes.windll.user32.mouse_event(0x0001, 0, -1, 0, 0)
-    if right_click:
-        pyautogui.rightClick()
-    else:
-        pyautogui.click()
+        inp.move(x,y)
+        inp.pause(inp.GAP) # the PAUSE pyautogui used to add after moveTo, part of the hover
+    inp.move_relative(0, 1)
+    inp.pause(delay)
+    inp.move_relative(0, -1)
+    inp.click(button="right" if right_click else "left")
 
 
 # Wait for start screen
 def wait_start(delay: int | None = None):
-    i = 0
     if delay is None:
         delay = 1
     else:
         delay = delay
-    found = False
-    while found == False and i<90: # 1 and a half minute
+    def start_screen():
         try: 
-            i+=1
             if Settings.START_BUTTON_ID:
-                if bt.does_exist("Winter\\VoteStartButton.png",confidence=0.8,grayscale=True):
-                    found = True
-            else:
-                if pyautogui.pixel(874, 226) == (8,148,8): #green pixel
-                    found = True
+                return bt.does_exist("Winter\\VoteStartButton.png",confidence=0.8,grayscale=True)
+            return pt.check("start_green") #green pixel
         except Exception as e:
             print(f"e {e}")
-        time.sleep(delay)
+            return False
+    try:
+        waited = wait.wait_for(start_screen, timeout=90*delay, poll_interval=0.1, max_interval=delay) # 1 and a half minute
+        print(f"Start screen found after {waited:.2f}s")
+    except wait.WaitTimeout as e:
+        print(e)
 
 
 def quick_rts(): # Returns to spawn
@@ -132,6 +159,27 @@ def quick_rts(): # Returns to spawn
         click(loc[0], loc[1], delay=0.1)
         time.sleep(0.2)
         
+def default_paths() -> dict:
+    # Used when PATHS in the settings doesn't have a path (older settings files), areas 3-5 keep the old delay settings
+    a3 = getattr(Settings, "AREA_3_DELAYS", [3, 1.65, 1.6, 0.5])
+    a4 = getattr(Settings, "AREA_4_DELAYS", [3, 1.7])
+    a5 = getattr(Settings, "AREA_5_DELAYS", [3, 1.85])
+    v = {"press": "v"}
+    return {
+        "area_1": [{"hold": "a", "for": 0.4}, {"wait": 1}, v, {"wait": 1.5}, {"hold": "w", "for": 1.5}, {"hold": "a", "for": 1.1}],
+        "area_2": [{"hold": "a", "for": 0.4}, {"wait": 1}, v, {"wait": 1.5}, {"hold": "w", "for": 1.5}],
+        "area_3": [v, {"wait": 1}, {"hold": "a", "for": a3[0]}, {"hold": "s", "for": a3[1]}, {"hold": "d", "for": a3[2]}, {"hold": "s", "for": a3[3]}, v, {"wait": 2}],
+        "area_4": [v, {"wait": 1}, {"hold": "a", "for": a4[0]}, {"hold": "s", "for": a4[1]}, v, {"wait": 2}],
+        "area_5": [v, {"wait": 1}, {"hold": "a", "for": a5[0]}, {"hold": "w", "for": a5[1]}, v, {"wait": 2}],
+        "barricade": [v, {"wait": 1}, {"hold": "a", "for": 0.7}, {"press": "e", "times": 2}, {"hold": "w", "for": 0.2}, {"press": "e", "times": 2},
+                      {"hold": "s", "for": 0.4}, {"press": "e", "times": 2}, {"wait": 1}, v, {"wait": 2}],
+    }
+
+def run_path(name: str) -> None:
+    # Walks a path from PATHS in the settings with the perf_counter timing engine
+    steps = getattr(Settings, "PATHS", {}).get(name) or default_paths()[name]
+    path.run(path.resolve(steps), name=name)
+
 def directions(area: str, unit: str | None=None): # This is for all the pathing
     '''
     This is the pathing for all the areas: 1 [rabbit, nami, hero (trash gamer)], 2 [speed, tak], 3: Mystery box, 4: Upgrader, 5: Monarch upgrader
@@ -144,20 +192,9 @@ def directions(area: str, unit: str | None=None): # This is for all the pathing
             #DIR_PATHING
             # Pathing
             if not Settings.CTM_P1_P2:
-                keyboard.press('a')
-                time.sleep(0.4)
-                keyboard.release('a')
-                time.sleep(1)
-                keyboard.press_and_release('v')
-                time.sleep(1.5)
-                keyboard.press('w')
-                time.sleep(1.5)
-                keyboard.release('w')
-                keyboard.press('a')
-                time.sleep(1.1)
-                keyboard.release('a')
+                run_path('area_1')
             else:
-                keyboard.press_and_release('v')
+                inp.press('v')
                 time.sleep(1)
                 for p in Settings.CTM_AREA_1:
                     click(p[0],p[1],delay=0.2,right_click=True)
@@ -173,22 +210,14 @@ def directions(area: str, unit: str | None=None): # This is for all the pathing
             if unit == "hero":
                 click(Settings.CTM_AREA_1_UNITS[2][0], Settings.CTM_AREA_1_UNITS[2][1], delay=0.2,right_click=True)
                 time.sleep(1)
-            keyboard.press_and_release('v') 
+            inp.press('v') 
             time.sleep(2)
         # Speed wagon + Tak
         if area == '2':
             if not Settings.CTM_P1_P2:
-                keyboard.press('a')
-                time.sleep(0.4)
-                keyboard.release('a')
-                time.sleep(1)
-                keyboard.press_and_release('v')
-                time.sleep(1.5)
-                keyboard.press('w')
-                time.sleep(1.5)
-                keyboard.release('w')
+                run_path('area_2')
             else:
-                keyboard.press_and_release('v')
+                inp.press('v')
                 time.sleep(1.3)
                 for p in Settings.CTM_AREA_2:
                     click(p[0],p[1],delay=0.2,right_click=True)
@@ -201,124 +230,68 @@ def directions(area: str, unit: str | None=None): # This is for all the pathing
             if unit == 'tak':
                 click(Settings.CTM_AREA_2_UNITS[1][0], Settings.CTM_AREA_2_UNITS[1][1], delay=0.2,right_click=True)
                 time.sleep(1)
-            keyboard.press_and_release('v')
+            inp.press('v')
             time.sleep(2)
         # Gambling time
         if area == '3': 
-            keyboard.press_and_release('v')
-            time.sleep(1)
-            keyboard.press('a')
-            time.sleep(Settings.AREA_3_DELAYS[0])
-            keyboard.release('a')
-
-            keyboard.press('s')
-            time.sleep(Settings.AREA_3_DELAYS[1])
-            keyboard.release('s')
-
-            keyboard.press('d')
-            time.sleep(Settings.AREA_3_DELAYS[2])
-            keyboard.release('d')
-
-            keyboard.press('s')
-            time.sleep(Settings.AREA_3_DELAYS[3])
-            keyboard.release('s')
-            keyboard.press_and_release('v')
-            time.sleep(2)
+            run_path('area_3')
             e_delay = 0.7
             timeout = 2.5/e_delay
             at_location = False
             while not at_location:
-                keyboard.press_and_release('e')
+                flow.check()
+                inp.press('e')
                 time.sleep(e_delay)
-                if bt.does_exist("Winter\\LootBox.png",confidence=0.7,grayscale=True, region=(493, 543, 1024, 785)):
-                    at_location = True
-                if  bt.does_exist("Winter\\Full_Bar.png",confidence=0.7,grayscale=True, region=(493, 543, 1024, 785)):
-                    at_location = True
-                if  bt.does_exist("Winter\\NO_YEN.png",confidence=0.7,grayscale=True,  region=(493, 543, 1024, 785)):
+                if bt.detect_any(["Winter\\LootBox.png", "Winter\\Full_Bar.png", "Winter\\NO_YEN.png"],confidence=0.7,grayscale=True, region=(493, 543, 1024, 785), stop_at_first=True):
                     at_location = True
                 if timeout < 0:
                     quick_rts()
-                    keyboard.press_and_release('v')
-                    time.sleep(1)
-                    keyboard.press('a')
-                    time.sleep(Settings.AREA_3_DELAYS[0])
-                    keyboard.release('a')
-
-                    keyboard.press('s')
-                    time.sleep(Settings.AREA_3_DELAYS[1])
-                    keyboard.release('s')
-
-                    keyboard.press('d')
-                    time.sleep(Settings.AREA_3_DELAYS[2])
-                    keyboard.release('d')
-
-                    keyboard.press('s')
-                    time.sleep(Settings.AREA_3_DELAYS[3])
-                    keyboard.release('s')
-                    keyboard.press_and_release('v')
-                    time.sleep(2)
+                    run_path('area_3')
                     timeout = 3/e_delay
                 timeout-=1
             print("At lootbox")
 
         if area == '4': #  Upgrader location
-            keyboard.press_and_release('v')
-            time.sleep(1)
-            keyboard.press('a')
-            time.sleep(Settings.AREA_4_DELAYS[0])
-            keyboard.release('a')
-
-            keyboard.press('s')
-            time.sleep(Settings.AREA_4_DELAYS[1])
-            keyboard.release('s')
-            keyboard.press_and_release('v')
-            time.sleep(2)
+            run_path('area_4')
             
         if area == '5': # This is where it buys monarch
-            keyboard.press_and_release('v')
-            time.sleep(1)
-            keyboard.press('a')
-            time.sleep(Settings.AREA_5_DELAYS[0])
-            keyboard.release('a')
-
-            keyboard.press('w')
-            time.sleep(Settings.AREA_5_DELAYS[1])
-            keyboard.release('w')
-            keyboard.press_and_release('v')
-            time.sleep(2)
+            run_path('area_5')
         
 def upgrader(upgrade: str):
     '''
     Buys the upgrades for the winter event: fortune, range, damage, speed, armor
     '''
     e_delay = 0.2
-    timeout = 3/e_delay
-    keyboard.press_and_release('e')
-    while not pyautogui.pixel(1111,310) == (255,255,255):
-        if timeout < 0:
+    inp.press('e')
+    while True:
+        try:
+            wait.wait_for(lambda: pt.check("upgrader_open"), timeout=3, max_interval=e_delay,
+                          on_tick=lambda *_: inp.press('e'), tick_interval=e_delay, name="upgrader")
+            break
+        except wait.WaitTimeout:
+            flow.check()
             quick_rts()
             directions('4')
-            timeout = 3/e_delay
-        timeout-=1
-        keyboard.press_and_release('e')
-        time.sleep(e_delay)
     click(607, 381, delay=0.2)
     time.sleep(0.5)
+    bought = f"bought_{upgrade}" + ("_nav" if Settings.USE_UI_NAV else "") # pixel signature, one small grab per check
     if not Settings.USE_UI_NAV:
         if upgrade == 'fortune':
             click(966, 471, delay=0.2)
             time.sleep(0.5)
-            while not pyautogui.pixelMatchesColor(966, 471,expectedRGBColor=(24, 24, 24),tolerance=40):
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(966, 471, delay=0.2)
                 time.sleep(0.8)
-            print(pyautogui.pixel(966, 471))
+            print(bt.grab_frame((966, 471, 1, 1)).pixel(966, 471))
             click(1112, 309, delay=0.2)
         if upgrade == 'range':
             click(962, 621, delay=0.2)
             time.sleep(0.5)
-            while not pyautogui.pixelMatchesColor(962, 621,expectedRGBColor=(24, 24, 24),tolerance=40):
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(962, 621, delay=0.2)
@@ -327,133 +300,123 @@ def upgrader(upgrade: str):
         if upgrade == "damage":
             click(765, 497, delay=0.1)
             pos = (959, 399)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -450, 0)
+            inp.scroll(-450)
             time.sleep(0.2)
             click(pos[0], pos[1], delay=0.2)
             time.sleep(0.5)
-            while not pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
         if upgrade == "speed":
             click(765, 497, delay=0.1)
             pos = (957, 424)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -600, 0)
+            inp.scroll(-600)
             time.sleep(0.2)
             click(pos[0], pos[1], delay=0.2)
             time.sleep(0.5)
-            while not pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):  
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
         if upgrade == "armor":
             click(765, 497, delay=0.1)
             pos = (955, 577)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -600, 0)
+            inp.scroll(-600)
             time.sleep(0.2)
             click(pos[0], pos[1], delay=0.2)
             time.sleep(0.5)
-            while not  pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
     else:
         if upgrade == 'fortune':
             pos = (960, 406)
             print("hi")
             click(765, 497, delay=0.1)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -1000, 0)
+            inp.scroll(-1000)
             time.sleep(0.2)
-            pydirectinput.press('\\')
-            pydirectinput.press('\\')
-            while not pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):
+            inp.tap('\\', '\\', gap=0.1)
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
         if upgrade == 'range':
             pos = (955, 562)
             print("hi")
             click(765, 497, delay=0.1)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -1000, 0)
+            inp.scroll(-1000)
             time.sleep(0.2)
-            pydirectinput.press('\\')
-            pydirectinput.press('\\')
-            while not pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):
+            inp.tap('\\', '\\', gap=0.1)
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
         if upgrade == "damage":
             pos = (954, 415)
             print("hi")
             click(765, 497, delay=0.1)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -1000, 0)
+            inp.scroll(-1000)
             time.sleep(0.2)
-            pydirectinput.press('\\')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('\\')
-            while not pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):
+            inp.tap('\\', 'down', 'down', 'down', 'down', '\\', gap=0.1)
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
         if upgrade == "speed":
             pos = (956, 566)
             print("hi")
             click(765, 497, delay=0.1)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -1000, 0)
+            inp.scroll(-1000)
             time.sleep(0.2)
-            pydirectinput.press('\\')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('\\')
-            while not pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):
+            inp.tap('\\', 'down', 'down', 'down', 'down', '\\', gap=0.1)
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
         if upgrade == "armor":
             pos = (954, 561)
             print("hi")
             click(765, 497, delay=0.1)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, -1000, 0)
+            inp.scroll(-1000)
             time.sleep(0.2)
-            pydirectinput.press('\\')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('down')
-            pydirectinput.press('\\')
-            while not pyautogui.pixelMatchesColor(pos[0], pos[1],expectedRGBColor=(24, 24, 24),tolerance=40):
+            inp.tap('\\', 'down', 'down', 'down', 'down', 'down', '\\', gap=0.1)
+            while not pt.check(bought):
+                flow.check()
                 if not g_toggle:
                     break
                 click(pos[0], pos[1], delay=0.2)
                 time.sleep(0.8)
-            ctypes.windll.user32.mouse_event(0x0800, 0, 0, 1000, 0)
+            inp.scroll(1000)
             click(1112, 309, delay=0.2)
     
     
@@ -461,15 +424,14 @@ def upgrader(upgrade: str):
 
 
 def secure_select(pos: tuple[int,int]):
-    click(pos[0],pos[1],delay=0.2)
-    time.sleep(0.5)
-    while not pyautogui.pixel(607,381) == (255,255,255):
+    def dismiss_erza():
         if bt.does_exist('Winter\\Erza_Armor.png',confidence=0.8,grayscale=True):
             click(752, 548,delay=0.2)
             time.sleep(0.6)
-        click(pos[0],pos[1],delay=0.2)
-        time.sleep(0.8)
-    print(f"Selected unit at {pos}")
+    waited = bt.click_until(pos, "unit_panel_open", max_wait=None, settle=0.2, on_retry=dismiss_erza, cancel=flow.expired, name="unit panel")
+    if waited is None:
+        flow.check() # only gives up once the state is out of time
+    print(f"Selected unit at {pos} ({waited:.2f}s)")
 
 
 def place_unit(unit: str, pos : tuple[int,int], close: bool | None=None, region: tuple | None=None):
@@ -480,14 +442,16 @@ def place_unit(unit: str, pos : tuple[int,int], close: bool | None=None, region:
     time_out_2 = 50
     # Click on the unit
     if region is None:
-        while not bt.does_exist(f"Winter\\{unit}_hb.png", confidence=0.8, grayscale=False):
+        while not bt.does_exist(f"Winter\\{unit}_hb.png", confidence=0.8, grayscale=False, pyramid=True):
+            flow.check()
             if time_out_2 <= 0:
                 break
             time_out_2-=1
             time.sleep(0.3)
-        bt.click_image(f'Winter\\{unit}_hb.png', confidence=0.8,grayscale=False,offset=(0,0))
+        bt.click_image(f'Winter\\{unit}_hb.png', confidence=0.8,grayscale=False,offset=(0,0), pyramid=True)
     else:
         while not bt.does_exist(f"Winter\\{unit}_hb.png", confidence=0.8, grayscale=False,region=region):
+            flow.check()
             if time_out_2 <= 0:
                 break
             time_out_2-=1
@@ -495,9 +459,10 @@ def place_unit(unit: str, pos : tuple[int,int], close: bool | None=None, region:
         bt.click_image(f'Winter\\{unit}_hb.png', confidence=0.8,grayscale=False,offset=(0,0),region=region)
         
     time.sleep(0.2)
-    click(pos[0], pos[1], delay=0.67)
-    time.sleep(0.5)
-    while not pyautogui.pixel(607, 381) == (255,255,255):
+    # Place and return as soon as the unit panel opens, the retry loop below only runs if it never does
+    placed = bt.click_until(pos, "unit_panel_open", max_wait=3, settle=0.67, cancel=lambda: not g_toggle or flow.expired(), name="place unit")
+    while placed is None and not pt.check("unit_panel_open"):
+        flow.check()
         time_out-=1
         if time_out<=0:
             print("timed out")
@@ -505,22 +470,23 @@ def place_unit(unit: str, pos : tuple[int,int], close: bool | None=None, region:
         if g_toggle == False:
             break
         click(pos[0], pos[1], delay=0.67)
-        print(f"Target Color: (255,255,255), got: {pyautogui.pixel(607, 381)}")
+        print(f"Target Color: (255,255,255), got: {bt.grab_frame((607, 381, 1, 1)).pixel(607, 381)}")
         time.sleep(0.1)
-        keyboard.press_and_release('q')
+        inp.press('q')
         time.sleep(0.5)
         click(pos[0], pos[1], delay=0.1)
         time.sleep(1)
-        if bt.does_exist("Winter\\UnitExists.png",confidence=0.9,grayscale=True):
+        frame = bt.grab_frame(max_age=0.5) # the producer's frame is newer than the click after that 1s sleep
+        if bt.does_exist("Winter\\UnitExists.png",confidence=0.9,grayscale=True,frame=frame):
             break
-        if pyautogui.pixel(607, 381) == (255,255,255):
+        if pt.check("unit_panel_open", frame):
             break
         if True: # if u want it to re-click
             print("Retrying placement...")
             try:
                 # Click on the unit
                 if region is None:
-                    bt.click_image(f'Winter\\{unit}_hb.png', confidence=0.8,grayscale=False,offset=(0,0))
+                    bt.click_image(f'Winter\\{unit}_hb.png', confidence=0.8,grayscale=False,offset=(0,0), pyramid=True)
                 else:
                     bt.click_image(f'Winter\\{unit}_hb.png', confidence=0.8,grayscale=False,offset=(0,0),region=region)
                 time.sleep(0.2)
@@ -531,33 +497,49 @@ def place_unit(unit: str, pos : tuple[int,int], close: bool | None=None, region:
         click(607, 381, delay=0.2)
     print(f"Placed {unit} at {pos}")
         
+def can_afford(*items: str) -> bool:
+    # True when the yen counter covers PRICES of all items, also True if that isn't set up or can't be read
+    if not getattr(Settings, "YEN_REGION", None):
+        return True
+    return economy.can_afford(*items)
+
+def wait_for_yen(*items: str) -> None:
+    # Call before walking to a shop so the trip only happens once it can buy everything it's going for
+    if can_afford(*items):
+        return
+    eta = economy.eta(*items)
+    print(f"Waiting for yen to buy {', '.join(items)}" + (f" (~{eta:.0f}s)" if eta is not None else ""))
+    economy.wait_affordable(*items, cancel=lambda: not g_toggle or flow.expired())
+    flow.check() # waiting for yen counts against the state's time
+
 def buy_monarch(): # this just presses e untill it buys monarch, use after direction('5')
     monarch_region = (686, 606, 818, 646)
     e_delay = 0.4
-    timeout = 3/e_delay
-    keyboard.press_and_release('e')
-    while not bt.does_exist('Winter\\DetectArea.png',confidence=0.7,grayscale=True):
-        if bt.does_exist('Winter\\Monarch.png',confidence=0.7,grayscale=False,region=monarch_region):
+    def at_monarch():
+        frame = bt.grab_frame(max_age=0.35) # DetectArea is a full screen check so one grab covers both, shared with the watchers
+        return bt.does_exist('Winter\\DetectArea.png',confidence=0.7,grayscale=True,frame=frame) or bt.does_exist('Winter\\Monarch.png',confidence=0.7,grayscale=False,region=monarch_region,frame=frame)
+    inp.press('e')
+    while True:
+        try:
+            wait.wait_for(at_monarch, timeout=3, max_interval=e_delay,
+                          on_tick=lambda *_: inp.press('e'), tick_interval=e_delay, name="monarch area")
             break
-        if timeout < 0:
+        except wait.WaitTimeout:
+            flow.check()
             quick_rts()
             directions('5')
-            timeout = 3/e_delay
-        timeout-=1
-        keyboard.press_and_release('e')
-        time.sleep(e_delay)
     print("Found area")
-    while not bt.does_exist('Winter\\Monarch.png',confidence=0.7,grayscale=False,region=monarch_region):
-        if not g_toggle:
-            break
-        keyboard.press_and_release('e')
-        time.sleep(0.8)
-    print("got monarch")
+    waited = wait.wait_for(lambda: bt.does_exist('Winter\\Monarch.png',confidence=0.7,grayscale=False,region=monarch_region),
+                           max_interval=0.8, on_tick=lambda *_: inp.press('e'), tick_interval=0.8,
+                           cancel=lambda: not g_toggle, name="monarch")
+    if waited is not None:
+        print(f"got monarch ({waited:.2f}s)")
 
 def place_hotbar_units():
     # Scans and places all units in your hotbar, tracking them too
     placing = True
     while placing:
+        flow.check()
         is_unit = False
         for unit in Settings.Units_Placeable:
             if bt.does_exist(f"Winter\\{unit}_hb.png", confidence=0.8, grayscale=False):
@@ -573,7 +555,7 @@ def place_hotbar_units():
                         kag_ability = [(645, 444), (743, 817), (1091, 244)]
                         for cl in kag_ability:
                             if cl == (743, 817):
-                                bt.click_image("Winter\\Kaguya_Auto.png", confidence=0.8, grayscale=False, offset=[0,0]) 
+                                bt.click_image("Winter\\Kaguya_Auto.png", confidence=0.8, grayscale=False, offset=[0,0], pyramid=True) 
                             else:
                                 click(cl[0],cl[1],delay=0.2)
                                 time.sleep(1)
@@ -582,8 +564,9 @@ def place_hotbar_units():
                     place_unit(unit,doom)
                     time.sleep(2)
                     set_boss()
-                    keyboard.press_and_release('z')
+                    inp.press('z')
                     click(607, 381, delay=0.2)
+                    wait_for_yen('monarch')
                     directions('5')
                     buy_monarch()
                     quick_rts()
@@ -609,6 +592,7 @@ def ainz_setup(unit:str):
             click(Settings.Unit_Positions['Ainz'][0][0], Settings.Unit_Positions['Ainz'][0][1], delay=0.2)
             print("Waiting for world item logo")
             while not bt.does_exist("Winter\\CaloricThing.png",confidence=0.8,grayscale=False):
+                flow.check()
                 time.sleep(0.5)
             print(f"Placing unit {unit}")
         click(i[0],i[1],delay=0.2)
@@ -616,51 +600,31 @@ def ainz_setup(unit:str):
         time.sleep(1)
         
         if v == 14:
-            keyboard.write(unit)
+            inp.write(unit)
         time.sleep(0.5)
 
 def repair_barricades(): # Repair barricades 
     #DIR_BARRICADE
-    keyboard.press_and_release('v')
-    time.sleep(1)
-    keyboard.press('a')
-    time.sleep(0.7)
-    keyboard.release('a')
-    keyboard.press_and_release('e')
-    keyboard.press_and_release('e')
-    keyboard.press('w')
-    time.sleep(0.2)
-    keyboard.release('w')
-    keyboard.press_and_release('e')
-    keyboard.press_and_release('e')
-    keyboard.press('s')
-    time.sleep(0.4)
-    keyboard.release('s')
-    keyboard.press_and_release('e')
-    keyboard.press_and_release('e')
-    time.sleep(1)
-    keyboard.press_and_release('v')
-    time.sleep(2)
+    run_path('barricade')
     
 def set_boss(): # Sets unit priority to boss
-    keyboard.press_and_release('r')
-    keyboard.press_and_release('r')
-    keyboard.press_and_release('r')
-    keyboard.press_and_release('r')
-    keyboard.press_and_release('r')
+    inp.press('r', times=5) # one batched send
     
 def on_failure():
     print("ran")
-    time_out = 60/0.4
-    click(Settings.REPLAY_BUTTON_POS[0],Settings.REPLAY_BUTTON_POS[1],delay=0.2)
-    time.sleep(1)
-    while bt.does_exist("Winter\\DetectLoss.png",confidence=0.7,grayscale=True,region=(311, 295, 825, 428)):
-        if time_out<0:
-            on_disconnect()
+    def retry(*_):
         click(Settings.REPLAY_BUTTON_POS[0],Settings.REPLAY_BUTTON_POS[1],delay=0.2)
         print("Retrying...")
-        time_out-=1
-        time.sleep(0.4)
+    click(Settings.REPLAY_BUTTON_POS[0],Settings.REPLAY_BUTTON_POS[1],delay=0.2)
+    time.sleep(1) # let the loss screen react before polling it
+    while True:
+        try:
+            # 90s is what the old 150 tries 0.6s apart added up to
+            wait.wait_for(lambda: not bt.does_exist("Winter\\DetectLoss.png",confidence=0.7,grayscale=True,region=(311, 295, 825, 428)),
+                          timeout=90, max_interval=0.4, on_tick=retry, tick_interval=0.6, name="replay")
+            break
+        except wait.WaitTimeout:
+            on_disconnect()
     click(Settings.REPLAY_BUTTON_POS[0],Settings.REPLAY_BUTTON_POS[1],delay=0.2)
     
 
@@ -670,14 +634,15 @@ def sell_kaguya(): # Sells kaguya (cant reset while domain is active)
     click(1119, 450,delay=0.2)
     time.sleep(1)
     while not sold:
+        flow.check()
         sell = bt.click_image('Winter\\Kaguya.png',confidence=0.8,grayscale=False,offset=[0,0])
         if g_toggle == False:
             break
         if sell == True:
             time.sleep(1)
-            keyboard.press_and_release('x')
+            inp.press('x')
             sold = True
-        ctypes.windll.user32.mouse_event(0x0800, 0, 0, -100, 0)
+        inp.scroll(-100)
         tick+=1
         if tick>=40:
             sold = True
@@ -686,9 +651,14 @@ def sell_kaguya(): # Sells kaguya (cant reset while domain is active)
 def detect_loss():
     time.sleep(10)
     print("Starting loss detection")
+    feed = fp.subscribe() # frames come from the shared capture thread
     while True:
-        if pyautogui.pixelMatchesColor(690,270,(242,25,28),tolerance=10) or pyautogui.pixelMatchesColor(690,270,(199, 45, 40),tolerance=5):
+        frame = feed.next(timeout=5)
+        if frame is None:
+            continue
+        if pt.check("loss", frame):
             print("found loss")
+            checkpoint.clear() # the match is lost, nothing to resume
             try:
                 args = list(sys.argv)
                 if "--stopped" in args:
@@ -700,657 +670,681 @@ def detect_loss():
                 os._exit(0)
             except Exception as e:
                 print("Error")
-        time.sleep(1)
-def main():
-    print("Starting Winter Event Macro")
-    rabbit_pos = Settings.Unit_Positions.get("mirko")
-    speed_pos =  Settings.Unit_Positions.get("speedwagon")
-    start_of_run = datetime.now()
-    num_runs = 0  
+def match_placements() -> dict:
+    # Reset all placement counts:
+    return {
+        "Ainz": 1,
+        'Beni': 3,
+        'Rukia': 3,
+        'Mage': 3,
+        'Escanor': 1,
+        'Hero': 3,
+        'Kuzan':4,
+        'Kag':1
+    }
+
+def buy_mirko(): # Buys a mirko card at the rabbit shop untill it shows up in the hotbar
+    got_mirko = False
+    while not got_mirko:
+        flow.check()
+        directions('1', 'rabbit')
+        inp.press('e')
+        inp.press('e')
+        quick_rts()
+        time.sleep(1.5)
+        if bt.does_exist("Winter\\Bunny_hb.png",confidence=0.7,grayscale=False, region=(517, 761, 671, 885)):
+            print("Got mirko")
+            got_mirko = True
+        else:
+            print("Didnt detect mirko, retrying purchase")
+
+def upgrade_until(stop_image: str): # Presses t on the selected unit untill stop_image shows up (or it's maxed)
     while True:
-        if ROUND_RESTART > 0:
-            print("restart")
-            if num_runs >= ROUND_RESTART:
-                try:
-                    print("recconect")
-                    args = list(sys.argv)
-                    if "--stopped" in args:
-                        args.remove("--stopped")
-                    sys.stdout.flush()
-                    subprocess.Popen([sys.executable, *args, "--restart"])
-                    os._exit(0)
-                except Exception as e:
-                    print(e)
-        global g_toggle
-        if g_toggle:
-            # Reset all placement counts:
-            Reset_Placements = {
-                "Ainz": 1,
-                'Beni': 3,
-                'Rukia': 3,
-                'Mage': 3,
-                'Escanor': 1,
-                'Hero': 3,
-                'Kuzan':4,
-                'Kag':1
-            }   
-            Settings.Unit_Placements_Left = Reset_Placements.copy()
-            
-            print("Starting new match")
-            wait_start()
-            quick_rts()
-            time.sleep(2)
-            # Set up first 2 rabbits
-            got_mirko = False
-            while not got_mirko:
-                directions('1', 'rabbit')
-                keyboard.press_and_release('e')
-                keyboard.press_and_release('e')
-                quick_rts()
-                time.sleep(1.5)
-                if bt.does_exist("Winter\\Bunny_hb.png",confidence=0.7,grayscale=False, region=(517, 761, 671, 885)):
-                    print("Got mirko")
-                    got_mirko = True
-                else:
-                    print("Didnt detect mirko, retrying purchase")
-            click(835, 226, delay=0.2) # Start Match
-            
-             
-            place_unit('Bunny', rabbit_pos[0], close=True)
-            place_unit('Bunny', rabbit_pos[1], close=True)
-            
-            # get third
-            got_mirko_two = False
-            while not got_mirko_two:
-                directions('1', 'rabbit')
-                keyboard.press_and_release('e')
-                quick_rts()
-                time.sleep(1.5)
-                if bt.does_exist("Winter\\Bunny_hb.png",confidence=0.7,grayscale=False, region=(517, 761, 671, 885)):
-                    print("Got mirko")
-                    got_mirko_two = True
-                else:
-                    print("Didnt detect mirko, retrying purchase")
-            place_unit('Bunny', rabbit_pos[2], close=True)
-            
-            #Start farms - speedwagon
-            directions('2', 'speed')
-            keyboard.press_and_release('e')
-            keyboard.press_and_release('e')
-            keyboard.press_and_release('e')
-            place_unit('Speed', speed_pos[0], close=True)
-            place_unit('Speed', speed_pos[1], close=True)
-            place_unit('Speed', speed_pos[2], close=True)
-            for pos in speed_pos:
-                click(pos[0], pos[1], delay=0.2)
-                keyboard.press_and_release('z')
-                time.sleep(0.5)
-            click(607, 381, delay=0.2)
-             
-            # Tak's placement + max
-            
-        
-            if bt.does_exist("Winter\\Tak_Detect.png",confidence=0.8,grayscale=True):
-                bt.click_image("Winter\\Tak_Detect.png",confidence=0.8,grayscale=True,offset=(0,-20))   
-                click(50,50,delay=0.1,right_click=True,dont_move=True)
-            else:
-                keyboard.press('w')
-                time.sleep(Settings.TAK_W_DELAY)
-                keyboard.release('w')
-            if TAK_FINDER:
-                path_tak = False
-                while not path_tak:
-                    keyboard.press('w')
-                    time.sleep(0.1)
-                    keyboard.release('w')
-                    keyboard.press_and_release('e')
-                    time.sleep(0.4)
-                    if bt.does_exist('Winter\\TakDetect.png', confidence=0.7, grayscale=True,region=(581, 676, 958, 752)) or  bt.does_exist('Winter\\Tak_hb.png', confidence=0.7, grayscale=False):
-                        path_tak = True
-                    time.sleep(0.5)
-            # Press e untill tak is bought
-            while not bt.does_exist('Winter\\Tak_hb.png', confidence=0.7, grayscale=False):
-                keyboard.press_and_release('e')
-                time.sleep(0.2)
-            
-            place_unit("Tak", Settings.Unit_Positions.get("tak"))
-            keyboard.press_and_release('z')
-            time.sleep(0.5)
-            click(607, 381, delay=0.2)
-            
-            #DIR_NAMICARD
-            if bt.does_exist("Winter\\Nami_detect.png",confidence=0.8,grayscale=True):
-                bt.click_image("Winter\\Nami_detect.png",confidence=0.8,grayscale=True,offset=(0,0))   
-                click(50,50,delay=0.1,right_click=True,dont_move=True)
-            else:
-                click(Settings.CTM_NAMI_CARD[0], Settings.CTM_NAMI_CARD[1], delay=0.2, right_click=True) # Goes to nami's card
-            time.sleep(2)
-            #Nami
-            while not bt.does_exist('Winter\\Nami_hb.png', confidence=0.7, grayscale=False, region=(528, 788, 749, 860)): # Buys nami's card
-                keyboard.press_and_release('e')
-                time.sleep(0.2)
-            quick_rts()
-            place_unit('Nami',(755, 524), region=(528, 788, 749, 860)) # Nami placement
-            keyboard.press_and_release('z')
-            # Go to upgrader for fortune
-            directions('4')
-            upgrader('fortune')
-            quick_rts()
-            
-            # Start auto upgrading first rabbit
-            secure_select(rabbit_pos[0])
-            time.sleep(0.5)
-            keyboard.press_and_release('z')
-            click(607, 381, delay=0.2)
-            
-            # get +100% dmg upgrade
-            directions('4')
-            upgrader('damage')
-            quick_rts()
-            
-            # Start auto upgrading rabbit 1 & 2
-            secure_select(rabbit_pos[1])
-            time.sleep(0.5)
-            keyboard.press_and_release('z')
-            click(607, 381, delay=0.2)
+        flow.check()
+        if bt.does_exist(stop_image,confidence=0.8,grayscale=False,region=(433, 477, 603, 555)): # a state check, always matched for real (no gate)
+            print("Stop")
+            break
+        if bt.does_exist("Unit_Maxed.png",confidence=0.8,grayscale=False,pyramid=True):
+            print("Stop, maxed on accident")
+            break
+        inp.press('t')
+        time.sleep(0.5)
+    time.sleep(0.5)
+    click(607, 381, delay=0.2)
+
+def monarch_unit(pos: tuple[int,int]): # Auto upgrade + boss priority + monarch for a placed unit
+    click(pos[0],pos[1],delay=0.2)
+    time.sleep(0.5)
+    inp.press('z')
+    set_boss()
+    time.sleep(0.5)
+    click(607, 381, delay=0.2)
+    wait_for_yen('monarch')
+    directions('5')
+    buy_monarch()
+    quick_rts()
+    time.sleep(0.5)
+    click(pos[0],pos[1],delay=0.2)
+    time.sleep(0.5)
+    click(607, 381, delay=0.2)
+
+def buy_rest_lanes(): # Buys the last lanes (wave 139/149)
+    done_path = Event()
+    def spam_e():
+        while not done_path.is_set():
+            inp.press('e')
+            time.sleep(0.2)
+        print("Done buying lanes")
+    quick_rts()
+    #DIR_BUYRESTLANES
+    inp.press('f')
+    time.sleep(0.7)
+    bt.click_image("Winter\\LookDownFinder.png",confidence=0.8,grayscale=False,offset=[0,-50])
+    inp.press('f')
+    clicks_look_down =  [(404, 400), (649, 772), (745, 858)]
+    for i in clicks_look_down:
+        click(i[0],i[1],delay=0.1)
+        if i != (649, 772):
+            time.sleep(0.3)
+        else:
             time.sleep(1)
-            secure_select(rabbit_pos[2])
+    inp.key_down('o')
+    time.sleep(1)
+    inp.key_up('o')
+    inp.key_down('s')
+    time.sleep(Settings.BUY_FINAL_LANE_DELAYS[0])
+    inp.key_up('s')
+    inp.press('v')
+    time.sleep(1)
+    Thread(target=spam_e).start()
+    inp.key_down('a')
+    time.sleep(Settings.BUY_FINAL_LANE_DELAYS[1])
+    inp.key_up("a")
+    inp.key_down('d')
+    time.sleep(Settings.BUY_FINAL_LANE_DELAYS[2])
+    inp.key_up('d')
+    inp.press('v')
+    quick_rts()
+    time.sleep(2)
+    done_path.set()
+
+# Match states, in order. Each one starts from spawn or from where the one before it ended,
+# progress inside a state that shouldn't be redone after a relaunch goes into flow.data + flow.save().
+def state_start():
+    if ROUND_RESTART > 0:
+        print("restart")
+        if flow.data.get("runs", 0) >= ROUND_RESTART:
+            try:
+                print("recconect")
+                args = list(sys.argv)
+                if "--stopped" in args:
+                    args.remove("--stopped")
+                sys.stdout.flush()
+                subprocess.Popen([sys.executable, *args, "--restart"])
+                os._exit(0)
+            except Exception as e:
+                print(e)
+    Settings.Unit_Placements_Left = match_placements()
+    flow.data = {"runs": flow.data.get("runs", 0), "placements": Settings.Unit_Placements_Left}
+    print("Starting new match")
+    wait_start()
+    quick_rts()
+    time.sleep(2)
+
+def state_mirko(): # first 2 rabbits
+    rabbit_pos = Settings.Unit_Positions.get("mirko")
+    buy_mirko()
+    click(835, 226, delay=0.2) # Start Match
+    place_unit('Bunny', rabbit_pos[0], close=True)
+    place_unit('Bunny', rabbit_pos[1], close=True)
+
+def state_mirko_3(): # get third
+    buy_mirko()
+    place_unit('Bunny', Settings.Unit_Positions.get("mirko")[2], close=True)
+
+def state_speedwagon(): #Start farms - speedwagon
+    speed_pos =  Settings.Unit_Positions.get("speedwagon")
+    directions('2', 'speed')
+    inp.press('e')
+    inp.press('e')
+    inp.press('e')
+    place_unit('Speed', speed_pos[0], close=True)
+    place_unit('Speed', speed_pos[1], close=True)
+    place_unit('Speed', speed_pos[2], close=True)
+    for pos in speed_pos:
+        click(pos[0], pos[1], delay=0.2)
+        inp.pace() # the z press used to get pyautogui's pause after the click
+        inp.press('z')
+        time.sleep(0.5)
+    click(607, 381, delay=0.2)
+
+def state_tak(): # Tak's placement + max
+    if bt.does_exist("Winter\\Tak_Detect.png",confidence=0.8,grayscale=True):
+        bt.click_image("Winter\\Tak_Detect.png",confidence=0.8,grayscale=True,offset=(0,-20))   
+        click(50,50,delay=0.1,right_click=True,dont_move=True)
+    else:
+        inp.key_down('w')
+        time.sleep(Settings.TAK_W_DELAY)
+        inp.key_up('w')
+    if TAK_FINDER:
+        path_tak = False
+        while not path_tak:
+            flow.check()
+            inp.key_down('w')
+            time.sleep(0.1)
+            inp.key_up('w')
+            inp.press('e')
+            time.sleep(0.4)
+            frame = bt.grab_frame(max_age=0.3) # taken after the e press
+            if bt.does_exist('Winter\\TakDetect.png', confidence=0.7, grayscale=True,region=(581, 676, 958, 752),frame=frame) or  bt.does_exist('Winter\\Tak_hb.png', confidence=0.7, grayscale=False,frame=frame):
+                path_tak = True
             time.sleep(0.5)
-            keyboard.press_and_release('z')
-            click(607, 381, delay=0.2)
-            time.sleep(1)
-            
-            # Get first monarch
-            directions('5')
-            buy_monarch()
-            quick_rts()
-            time.sleep(1)
-            secure_select(rabbit_pos[0])
-            
-            # Wave 19 lane unlocks for 20% boost
-            wave_19 = False
-            while not wave_19:
-                if avM.get_wave()>=19:
-                    #DIR_BUYMAINLANES
-                    keyboard.press('d')
-                    time.sleep(Settings.BUY_MAIN_LANE_DELAYS[0])
-                    keyboard.release('d')
-                    keyboard.press_and_release('e')
-                    keyboard.press_and_release('e')
-                    keyboard.press('w')
-                    time.sleep(Settings.BUY_MAIN_LANE_DELAYS[1])
-                    keyboard.release('w')
-                    keyboard.press_and_release('e')
-                    keyboard.press_and_release('e')
-                    wave_19=True
-                if not g_toggle:
-                    break
-                time.sleep(0.5)
+    # Press e untill tak is bought
+    wait_for_yen('tak')
+    while not bt.does_exist('Winter\\Tak_hb.png', confidence=0.7, grayscale=False):
+        flow.check()
+        inp.press('e')
+        time.sleep(0.2)
     
-            # Get 2nd and 3rd bunny monarch'd
-            quick_rts()
-            directions('5')
-            buy_monarch()
-            quick_rts()
-            time.sleep(1)
-            secure_select(rabbit_pos[1])
-            time.sleep(1)
-            directions('5')
-            buy_monarch()
-            quick_rts()
-            time.sleep(1)
-            secure_select(rabbit_pos[2])
-            
-            # Get all upgrades
-            directions('4')
-            upgrader('range')
-            upgrader('speed')
-            upgrader('armor')
-            quick_rts()
-            directions('3')
-            
-            Ben_Upgraded = False
-            Erza_Upgraded = False
-            
-            
-            # Lucky box
-            gamble_done = False
-            g_toggle= True
-            ainzplaced=False
-            while not gamble_done:
-                keyboard.press_and_release('e')
-                 
-                if bt.does_exist("Winter\\Full_Bar.png",confidence=0.7,grayscale=True, region=(493, 543, 1024, 785)) or bt.does_exist("Winter\\NO_YEN.png",confidence=0.7,grayscale=True,  region=(493, 543, 1024, 785)):
-                    quick_rts()
-                    time.sleep(3)
-                    place_hotbar_units()
-                    directions('3')
-                if not Erza_Upgraded:
-                    erza_buffer = Settings.Unit_Positions['Mage']
-                    if Settings.Unit_Placements_Left['Mage'] == 0:
-                        quick_rts()
-                        time.sleep(1)
-                        # BUffer
-                        secure_select(erza_buffer[0])
-                        time.sleep(8)
-                        click(356,655)
-                        time.sleep(0.8)
-                        click(647, 449,delay=0.2)
-                        while not bt.does_exist('Winter\\Erza_Armor.png',confidence=0.8,grayscale=True):
-                            click(1015,690,delay=0.2)
-                            time.sleep(0.5)
-                        click(752, 548,delay=0.2)
-                        time.sleep(0.5)
-                        click(1140, 290,delay=0.2)
-                        time.sleep(0.5)
-                        click(607, 381, delay=0.2)
-                            
-                        #Duelist 1
-                        secure_select(erza_buffer[1])
-                        time.sleep(0.8)
-                        keyboard.press_and_release('z')
-                        click(647, 449,delay=0.2)
-                        while not bt.does_exist('Winter\\Erza_Armor.png',confidence=0.8,grayscale=True):
-                            click(747, 690,delay=0.2)
-                            time.sleep(0.5)
-                        click(752, 548,delay=0.2)
-                        time.sleep(0.5)
-                        click(1140, 290,delay=0.2)
-                        set_boss()
-                        time.sleep(0.5)
-                        
-                        #Duelist 2
-                        secure_select(erza_buffer[2])
-                        time.sleep(0.8)
-                        click(647, 449,delay=0.2)
-                        keyboard.press_and_release('z')
-                        while not bt.does_exist('Winter\\Erza_Armor.png',confidence=0.8,grayscale=True):
-                            click(747, 690,delay=0.2)
-                            time.sleep(0.5)
-                        click(752, 548,delay=0.2)
-                        time.sleep(0.5)
-                        click(1140, 290,delay=0.2)
-                        set_boss()
-                        time.sleep(0.5)
-                        click(607, 381, delay=0.2)
-                        
-                        directions('5')
-                        buy_monarch()
-                        quick_rts()
-                        click(erza_buffer[1][0],erza_buffer[1][1],delay=0.2)
-                        time.sleep(0.5)
-                        
-                        directions('5')
-                        buy_monarch()
-                        quick_rts()
-                        click(erza_buffer[2][0],erza_buffer[2][1],delay=0.2)
-                        time.sleep(0.5)
-                        Erza_Upgraded = True
-                        # more gamble
-                        directions('3')
-                if not Ben_Upgraded:
-                    if Settings.Unit_Placements_Left['Beni'] == 0:
-                        quick_rts()
-                        time.sleep(1)
-                        for ben in Settings.Unit_Positions['Beni']:
-                            click(ben[0],ben[1],delay=0.2)
-                            secure_select((ben[0],ben[1]))
-                            time.sleep(0.5)
-                            keyboard.press_and_release('z')
-                            set_boss()
-                            time.sleep(0.5)
-                            click(607, 381, delay=0.2)
-                            directions('5')
-                            buy_monarch()
-                            quick_rts()
-                            time.sleep(0.5)
-                            secure_select((ben[0],ben[1]))
-                            time.sleep(0.5)
-                            click(607, 381, delay=0.2)
-                        Ben_Upgraded = True
-                        # more gamble
-                        directions('3')
-                if not ainzplaced:
-                    if Settings.Unit_Placements_Left['Ainz'] == 0: # Ainz thingy
-                        ainzplaced = True
-                        quick_rts()
-                        time.sleep(1)
-                        ainz_pos = Settings.Unit_Positions['Ainz']
-                        pos = Settings.Unit_Positions.get("Caloric_Unit")
-                        secure_select((ainz_pos[0]))
-                        time.sleep(0.5)
-                        if Settings.USE_WD == True:
-                            ainz_setup(unit="world des")
-                        elif Settings.USE_DIO == True:
-                            ainz_setup(unit="god")
-                        else:
-                            ainz_setup(unit=Settings.USE_AINZ_UNIT)
-                        global AINZ_SPELLS
-                        if not AINZ_SPELLS:
-                            AINZ_SPELLS = True
-                        click(pos[0], pos[1], delay=0.67) # Place world destroyer + auto upgrade
-                        time.sleep(0.5)
-                        while not pyautogui.pixel(607, 381) == (255,255,255):
-                            if g_toggle == False:
-                                break
-                            click(pos[0], pos[1], delay=0.67)
-                            time.sleep(0.5)
-                        time.sleep(1)
-                        if Settings.USE_DIO:
-                            ability_clicks = [(648, 448), (1010, 563), (1099, 309)]
-                            for p in ability_clicks:
-                                click(p[0], p[1], delay=0.2)
-                                time.sleep(1.2)
-                        if Settings.MAX_UPG_AINZ_PLACEMENT:
-                            keyboard.press_and_release('z')
-                        if Settings.MONARCH_AINZ_PLACEMENT:
-                            directions('5')
-                            buy_monarch()
-                            quick_rts()
-                            time.sleep(1)
-                            click(pos[0], pos[1], delay=0.67) 
-                        time.sleep(1)
-                        print("Placed ainz's unit")
-                        click(607, 381, delay=0.2)
-                        
-                        # Ainz auto upgrade + monarch
-                        secure_select((ainz_pos[0]))
-                        time.sleep(0.5)
-                        keyboard.press_and_release('z')
-                        time.sleep(0.5)
-                        click(607, 381, delay=0.2)
-                        directions('5')
-                        buy_monarch()
-                        quick_rts()
-                        time.sleep(1)
-                        click(ainz_pos[0][0],ainz_pos[0][1],delay=0.2)
-                        time.sleep(1)
-                        # go gamble more son
-                        directions('3')
-                print("===============================")
-                is_done = True
-                for unit in Settings.Units_Placeable:
-                    if unit != "Doom":
-                        if Settings.Unit_Placements_Left[unit] > 0:
-                            is_done = False
-                            print(f"{unit} has {Settings.Unit_Placements_Left[unit]} placements left.")
-                print("===============================")
-                if is_done:
-                    gamble_done = True
-                time.sleep(0.1)
-            print("Gambling done")
-             
-               
+    place_unit("Tak", Settings.Unit_Positions.get("tak"))
+    inp.press('z')
+    time.sleep(0.5)
+    click(607, 381, delay=0.2)
 
-            # Auto upgrade + Monarch everything else
-            
-            # set up buffer erza
-            
-            quick_rts()
-            time.sleep(1)
+def state_nami():
+    #DIR_NAMICARD
+    if bt.does_exist("Winter\\Nami_detect.png",confidence=0.8,grayscale=True):
+        bt.click_image("Winter\\Nami_detect.png",confidence=0.8,grayscale=True,offset=(0,0))   
+        click(50,50,delay=0.1,right_click=True,dont_move=True)
+    else:
+        click(Settings.CTM_NAMI_CARD[0], Settings.CTM_NAMI_CARD[1], delay=0.2, right_click=True) # Goes to nami's card
+    time.sleep(2)
+    #Nami
+    while not bt.does_exist('Winter\\Nami_hb.png', confidence=0.7, grayscale=False, region=(528, 788, 749, 860)): # Buys nami's card
+        flow.check()
+        inp.press('e')
+        time.sleep(0.2)
+    quick_rts()
+    place_unit('Nami',(755, 524), region=(528, 788, 749, 860)) # Nami placement
+    inp.press('z')
+
+def state_fortune():
+    rabbit_pos = Settings.Unit_Positions.get("mirko")
+    # Go to upgrader for fortune
+    wait_for_yen('fortune')
+    directions('4')
+    upgrader('fortune')
+    quick_rts()
+    
+    # Start auto upgrading first rabbit
+    secure_select(rabbit_pos[0])
+    time.sleep(0.5)
+    inp.press('z')
+    click(607, 381, delay=0.2)
+
+def state_damage():
+    rabbit_pos = Settings.Unit_Positions.get("mirko")
+    # get +100% dmg upgrade
+    wait_for_yen('damage')
+    directions('4')
+    upgrader('damage')
+    quick_rts()
+    
+    # Start auto upgrading rabbit 1 & 2
+    secure_select(rabbit_pos[1])
+    time.sleep(0.5)
+    inp.press('z')
+    click(607, 381, delay=0.2)
+    time.sleep(1)
+    secure_select(rabbit_pos[2])
+    time.sleep(0.5)
+    inp.press('z')
+    click(607, 381, delay=0.2)
+    time.sleep(1)
+
+def state_monarch():
+    # Get first monarch
+    wait_for_yen('monarch')
+    directions('5')
+    buy_monarch()
+    quick_rts()
+    time.sleep(1)
+    secure_select(Settings.Unit_Positions.get("mirko")[0])
+
+def state_wave_19():
+    # Wave 19 lane unlocks for 20% boost
+    wave_19 = False
+    while not wave_19:
+        flow.check()
+        if (waves.current() or 0)>=19:
+            #DIR_BUYMAINLANES
+            inp.key_down('d')
+            time.sleep(Settings.BUY_MAIN_LANE_DELAYS[0])
+            inp.key_up('d')
+            inp.press('e')
+            inp.press('e')
+            inp.key_down('w')
+            time.sleep(Settings.BUY_MAIN_LANE_DELAYS[1])
+            inp.key_up('w')
+            inp.press('e')
+            inp.press('e')
+            wave_19=True
+        if not g_toggle:
+            break
+        time.sleep(0.5)
+
+def state_monarchs():
+    # Get 2nd and 3rd bunny monarch'd
+    rabbit_pos = Settings.Unit_Positions.get("mirko")
+    done = flow.data.setdefault("rabbit_monarchs", [])
+    quick_rts()
+    for i in (1, 2):
+        if i in done:
+            continue
+        wait_for_yen('monarch')
+        directions('5')
+        buy_monarch()
+        quick_rts()
+        time.sleep(1)
+        secure_select(rabbit_pos[i])
+        time.sleep(1)
+        done.append(i)
+        flow.save()
+
+def state_upgrades():
+    # Get all upgrades
+    wait_for_yen('range', 'speed', 'armor') # one trip for all three
+    directions('4')
+    upgrader('range')
+    upgrader('speed')
+    upgrader('armor')
+    quick_rts()
+
+def state_gamble():
+    global g_toggle
+    directions('3')
     
-            # World destroyer
-            if Settings.USE_WD:
-                secure_select(Settings.Unit_Positions.get("Caloric_Unit"))
+    # Lucky box
+    gamble_done = False
+    g_toggle= True
+    while not gamble_done:
+        flow.check()
+        pressed = time.perf_counter()
+        inp.press('e') # NO_YEN only shows up after a press, it's what sends the loop to placing units
+         
+        if bt.detect_any(["Winter\\Full_Bar.png", "Winter\\NO_YEN.png"],confidence=0.7,grayscale=True, region=(493, 543, 1024, 785), stop_at_first=True, frame=bt.grab_frame(max_age=0.5, since=pressed)): # lucky box loop, a producer frame only if it's from after the press
+            quick_rts()
+            time.sleep(3)
+            place_hotbar_units()
+            flow.save() # placements left changed
+            wait_for_yen('lucky_box') # once per cycle, not on every poll
+            directions('3')
+        if not flow.data.get("erza_upgraded"):
+            erza_buffer = Settings.Unit_Positions['Mage']
+            if Settings.Unit_Placements_Left['Mage'] == 0:
+                quick_rts()
                 time.sleep(1)
-                while True:
-                    if bt.does_exist("Winter\\StopWD.png",confidence=0.8,grayscale=False,region=(433, 477, 603, 555)):
-                        print("Stop")
-                        break
-                    if bt.does_exist("Unit_Maxed.png",confidence=0.8,grayscale=False):
-                        print("Stop, maxed on accident")
-                        break
-                    keyboard.press_and_release('t')
+                # BUffer
+                secure_select(erza_buffer[0])
+                time.sleep(8)
+                click(356,655)
+                time.sleep(0.8)
+                click(647, 449,delay=0.2)
+                while not bt.does_exist('Winter\\Erza_Armor.png',confidence=0.8,grayscale=True):
+                    flow.check()
+                    click(1015,690,delay=0.2)
                     time.sleep(0.5)
+                click(752, 548,delay=0.2)
                 time.sleep(0.5)
-                click(607, 381, delay=0.2)
-            elif Settings.USE_DIO:
-                secure_select(Settings.Unit_Positions.get("Caloric_Unit"))
-                time.sleep(1)
-                while True:
-                    if bt.does_exist("Winter\\DIO_MOVE.png",confidence=0.8,grayscale=False,region=(433, 477, 603, 555)):
-                        print("Stop")
-                        break
-                    if bt.does_exist("Unit_Maxed.png",confidence=0.8,grayscale=False):
-                        print("Stop, maxed on accident")
-                        break
-                    keyboard.press_and_release('t')
-                    time.sleep(0.5)
+                click(1140, 290,delay=0.2)
                 time.sleep(0.5)
                 click(607, 381, delay=0.2)
-            elif Settings.MAX_UPG_AINZ_PLACEMENT == False:
-                secure_select(Settings.Unit_Positions.get("Caloric_Unit"))
-                time.sleep(1)
-                while True:
-                    if bt.does_exist("Winter\\YOUR_MOVE.png",confidence=0.8,grayscale=False,region=(433, 477, 603, 555)):
-                        print("Stop")
-                        break
-                    if bt.does_exist("Unit_Maxed.png",confidence=0.8,grayscale=False):
-                        print("Stop, maxed on accident")
-                        break
-                    keyboard.press_and_release('t')
+                    
+                #Duelist 1
+                secure_select(erza_buffer[1])
+                time.sleep(0.8)
+                inp.press('z')
+                click(647, 449,delay=0.2)
+                while not bt.does_exist('Winter\\Erza_Armor.png',confidence=0.8,grayscale=True):
+                    flow.check()
+                    click(747, 690,delay=0.2)
                     time.sleep(0.5)
+                click(752, 548,delay=0.2)
                 time.sleep(0.5)
-                click(607, 381, delay=0.2)
-            
-            # ice queen
-            for ice in Settings.Unit_Positions['Rukia']:
-                 
-                secure_select((ice[0],ice[1]))
-                time.sleep(0.5)
+                click(1140, 290,delay=0.2)
                 set_boss()
                 time.sleep(0.5)
-                click(607, 381, delay=0.2)
-                directions('5')
-                buy_monarch()
-                quick_rts()
-                time.sleep(0.5)
-                secure_select((ice[0],ice[1]))
-                time.sleep(0.5)
-                while True:
-                    if bt.does_exist("Winter\\StopUpgradeRukia.png",confidence=0.8,grayscale=False,region=(433, 477, 603, 555)):
-                        print("Stop")
-                        break
-                    if bt.does_exist("Unit_Maxed.png",confidence=0.8,grayscale=False):
-                        print("Stop, maxed on accident")
-                        break
-                    keyboard.press_and_release('t')
-                    time.sleep(0.5)
-                time.sleep(0.5)
-                click(607, 381, delay=0.2)
-             
-               
-
                 
-            for gamer in Settings.Unit_Positions['Hero']:
-                 
-
-                click(gamer[0],gamer[1],delay=0.2)
+                #Duelist 2
+                secure_select(erza_buffer[2])
+                time.sleep(0.8)
+                click(647, 449,delay=0.2)
+                inp.pace() # the z press used to get pyautogui's pause after the click
+                inp.press('z')
+                while not bt.does_exist('Winter\\Erza_Armor.png',confidence=0.8,grayscale=True):
+                    flow.check()
+                    click(747, 690,delay=0.2)
+                    time.sleep(0.5)
+                click(752, 548,delay=0.2)
                 time.sleep(0.5)
-                keyboard.press_and_release('z')
+                click(1140, 290,delay=0.2)
                 set_boss()
                 time.sleep(0.5)
                 click(607, 381, delay=0.2)
+                
+                wait_for_yen('monarch')
                 directions('5')
                 buy_monarch()
                 quick_rts()
+                click(erza_buffer[1][0],erza_buffer[1][1],delay=0.2)
                 time.sleep(0.5)
-                click(gamer[0],gamer[1],delay=0.2)
-                time.sleep(0.5)
-                click(607, 381, delay=0.2)
-             
-            
-            for kuzan in Settings.Unit_Positions['Kuzan']:
-                click(kuzan[0],kuzan[1],delay=0.2)
-                time.sleep(0.5)
-                keyboard.press_and_release('z')
-                set_boss()
-                time.sleep(0.5)
-                click(607, 381, delay=0.2)
+                
+                wait_for_yen('monarch')
                 directions('5')
                 buy_monarch()
                 quick_rts()
+                click(erza_buffer[2][0],erza_buffer[2][1],delay=0.2)
                 time.sleep(0.5)
-                click(kuzan[0],kuzan[1],delay=0.2)
+                flow.data["erza_upgraded"] = True
+                flow.save()
+                # more gamble
+                directions('3')
+        if not flow.data.get("ben_upgraded"):
+            if Settings.Unit_Placements_Left['Beni'] == 0:
+                quick_rts()
+                time.sleep(1)
+                for ben in Settings.Unit_Positions['Beni']:
+                    click(ben[0],ben[1],delay=0.2)
+                    secure_select((ben[0],ben[1]))
+                    time.sleep(0.5)
+                    inp.press('z')
+                    set_boss()
+                    time.sleep(0.5)
+                    click(607, 381, delay=0.2)
+                    wait_for_yen('monarch')
+                    directions('5')
+                    buy_monarch()
+                    quick_rts()
+                    time.sleep(0.5)
+                    secure_select((ben[0],ben[1]))
+                    time.sleep(0.5)
+                    click(607, 381, delay=0.2)
+                flow.data["ben_upgraded"] = True
+                flow.save()
+                # more gamble
+                directions('3')
+        if not flow.data.get("ainz_placed"):
+            if Settings.Unit_Placements_Left['Ainz'] == 0: # Ainz thingy
+                flow.data["ainz_placed"] = True
+                flow.save()
+                quick_rts()
+                time.sleep(1)
+                ainz_pos = Settings.Unit_Positions['Ainz']
+                pos = Settings.Unit_Positions.get("Caloric_Unit")
+                secure_select((ainz_pos[0]))
+                time.sleep(0.5)
+                if Settings.USE_WD == True:
+                    ainz_setup(unit="world des")
+                elif Settings.USE_DIO == True:
+                    ainz_setup(unit="god")
+                else:
+                    ainz_setup(unit=Settings.USE_AINZ_UNIT)
+                global AINZ_SPELLS
+                if not AINZ_SPELLS:
+                    AINZ_SPELLS = True
+                click(pos[0], pos[1], delay=0.67) # Place world destroyer + auto upgrade
                 time.sleep(0.5)
+                while not pt.check("unit_panel_open"):
+                    if g_toggle == False:
+                        break
+                    flow.check()
+                    click(pos[0], pos[1], delay=0.67)
+                    time.sleep(0.5)
+                time.sleep(1)
+                if Settings.USE_DIO:
+                    ability_clicks = [(648, 448), (1010, 563), (1099, 309)]
+                    for p in ability_clicks:
+                        click(p[0], p[1], delay=0.2)
+                        time.sleep(1.2)
+                if Settings.MAX_UPG_AINZ_PLACEMENT:
+                    inp.press('z')
+                if Settings.MONARCH_AINZ_PLACEMENT:
+                    wait_for_yen('monarch')
+                    directions('5')
+                    buy_monarch()
+                    quick_rts()
+                    time.sleep(1)
+                    click(pos[0], pos[1], delay=0.67) 
+                time.sleep(1)
+                print("Placed ainz's unit")
                 click(607, 381, delay=0.2)
-
-             
-               
-            for esc in Settings.Unit_Positions['Escanor']:
-                click(esc[0],esc[1],delay=0.2)
+                
+                # Ainz auto upgrade + monarch
+                secure_select((ainz_pos[0]))
                 time.sleep(0.5)
-                keyboard.press_and_release('z')
-                set_boss()
+                inp.press('z')
                 time.sleep(0.5)
                 click(607, 381, delay=0.2)
+                wait_for_yen('monarch')
                 directions('5')
                 buy_monarch()
                 quick_rts()
-                time.sleep(0.5)
-                click(esc[0],esc[1],delay=0.2)
-                time.sleep(0.5)
-                click(607, 381, delay=0.2)
-            if Settings.WAVE_RESTART_150:
-                wave_150 = False
-                done_path = False   
-                while not wave_150:
-                    if avM.get_wave() == 149 and not done_path:       
-                        def spam_e():
-                            while not done_path:
-                                keyboard.press_and_release('e')
-                                time.sleep(0.2)
-                            print("Done buying lanes")
-                        quick_rts()
-                        #DIR_BUYRESTLANES
-                        keyboard.press_and_release('f')
-                        time.sleep(0.7)
-                        bt.click_image("Winter\\LookDownFinder.png",confidence=0.8,grayscale=False,offset=[0,-50])
-                        keyboard.press_and_release('f')
-                        clicks_look_down =  [(404, 400), (649, 772), (745, 858)]
-                        for i in clicks_look_down:
-                            click(i[0],i[1],delay=0.1)
-                            if i != (649, 772):
-                                time.sleep(0.3)
-                            else:
-                                time.sleep(1)
-                        keyboard.press('o')
-                        time.sleep(1)
-                        keyboard.release('o')
-                        keyboard.press('s')
-                        time.sleep(Settings.BUY_FINAL_LANE_DELAYS[0])
-                        keyboard.release('s')
-                        keyboard.press_and_release('v')
-                        time.sleep(1)
-                        Thread(target=spam_e).start()
-                        keyboard.press('a')
-                        time.sleep(Settings.BUY_FINAL_LANE_DELAYS[1])
-                        keyboard.release("a")
-                        keyboard.press('d')
-                        time.sleep(Settings.BUY_FINAL_LANE_DELAYS[2])
-                        keyboard.release('d')
-                        keyboard.press_and_release('v')
-                        quick_rts()
-                        time.sleep(2)
-                        done_path = True
-                    if avM.get_wave()==150:
-                        wave_150 = True
-                    else:
-                        if avM.get_wave()%2==0 or avM.get_wave() == 139:
-                            repair_barricades()
-                            quick_rts()
-                    time.sleep(2)
-            else:
-                wave_140 = False
-                done_path = False   
-                while not wave_140:
-                    if avM.get_wave() == 139 and not done_path:       
-                        def spam_e():
-                            while not done_path:
-                                keyboard.press_and_release('e')
-                                time.sleep(0.2)
-                            print("Done buying lanes")
-                        quick_rts()
-                        #DIR_BUYRESTLANES
-                        keyboard.press_and_release('f')
-                        time.sleep(0.7)
-                        bt.click_image("Winter\\LookDownFinder.png",confidence=0.8,grayscale=False,offset=[0,-50])
-                        keyboard.press_and_release('f')
-                        clicks_look_down =  [(404, 400), (649, 772), (745, 858)]
-                        for i in clicks_look_down:
-                            click(i[0],i[1],delay=0.1)
-                            if i != (649, 772):
-                                time.sleep(0.3)
-                            else:
-                                time.sleep(1)
-                        keyboard.press('o')
-                        time.sleep(1)
-                        keyboard.release('o')
-                        keyboard.press('s')
-                        time.sleep(Settings.BUY_FINAL_LANE_DELAYS[0])
-                        keyboard.release('s')
-                        keyboard.press_and_release('v')
-                        time.sleep(1)
-                        Thread(target=spam_e).start()
-                        keyboard.press('a')
-                        time.sleep(Settings.BUY_FINAL_LANE_DELAYS[1])
-                        keyboard.release("a")
-                        keyboard.press('d')
-                        time.sleep(Settings.BUY_FINAL_LANE_DELAYS[2])
-                        keyboard.release('d')
-                        keyboard.press_and_release('v')
-                        quick_rts()
-                        time.sleep(2)
-                        done_path = True
-                    if avM.get_wave()==140:
-                        wave_140 = True
-                    else:
-                        if avM.get_wave()%2==0 or avM.get_wave() == 139 and done_path:
-                            repair_barricades()
-                            quick_rts()
-                    time.sleep(2)
-            num_runs+=1
-            print(f"Run over, runs: {num_runs}")
-            try:
-                    victory = wt.screen_shot_memory()
-                    runtime = f"{datetime.now()-start_of_run}"
-                
-                    g = Thread(target=webhook.send_webhook,
-                        kwargs={
+                time.sleep(1)
+                click(ainz_pos[0][0],ainz_pos[0][1],delay=0.2)
+                time.sleep(1)
+                # go gamble more son
+                directions('3')
+        print("===============================")
+        is_done = True
+        for unit in Settings.Units_Placeable:
+            if unit != "Doom":
+                if Settings.Unit_Placements_Left[unit] > 0:
+                    is_done = False
+                    print(f"{unit} has {Settings.Unit_Placements_Left[unit]} placements left.")
+        print("===============================")
+        if is_done:
+            gamble_done = True
+        time.sleep(0.1)
+    print("Gambling done")
 
-                                "run_time": f"{str(runtime).split('.')[0]}",
-                                "num_runs": num_runs,
-                                "task_name": "Winter Event",
-                                "img": victory,
-                            },
-                        )            
-                    g.start()
-            except Exception as e:
-                print(f" error {e}")
-                
-                
-            ainz_pos = Settings.Unit_Positions['Ainz']
-            click(ainz_pos[0][0],ainz_pos[0][1],delay=0.2)
-            time.sleep(0.5)
-            keyboard.press_and_release('x')
-            time.sleep(0.5)
-            keyboard.press_and_release('f')
+def state_max_units():
+    # Auto upgrade + Monarch everything else
+    done = flow.data.setdefault("maxed", [])
+    quick_rts()
+    time.sleep(1)
+
+    # World destroyer / dio / ainz's other unit, upgraded untill their move shows up
+    if "Caloric_Unit" not in done:
+        stop_image = None
+        if Settings.USE_WD:
+            stop_image = "Winter\\StopWD.png"
+        elif Settings.USE_DIO:
+            stop_image = "Winter\\DIO_MOVE.png"
+        elif Settings.MAX_UPG_AINZ_PLACEMENT == False:
+            stop_image = "Winter\\YOUR_MOVE.png"
+        if stop_image is not None:
+            secure_select(Settings.Unit_Positions.get("Caloric_Unit"))
             time.sleep(1)
-            sell_kaguya()
-            keyboard.press_and_release('f')
-            
-            match_restarted = False
-            while not match_restarted:
-                avM.restart_match() 
-                time.sleep(0.5)
-                if avM.get_wave() == 0:
-                    match_restarted = True
-                time.sleep(5)
+            upgrade_until(stop_image)
+        done.append("Caloric_Unit")
+        flow.save()
+    
+    # ice queen
+    for i, ice in enumerate(Settings.Unit_Positions['Rukia']):
+        if f"Rukia {i}" in done:
+            continue
+        secure_select((ice[0],ice[1]))
+        time.sleep(0.5)
+        set_boss()
+        time.sleep(0.5)
+        click(607, 381, delay=0.2)
+        wait_for_yen('monarch')
+        directions('5')
+        buy_monarch()
+        quick_rts()
+        time.sleep(0.5)
+        secure_select((ice[0],ice[1]))
+        time.sleep(0.5)
+        upgrade_until("Winter\\StopUpgradeRukia.png")
+        done.append(f"Rukia {i}")
+        flow.save()
+
+    for unit in ('Hero', 'Kuzan', 'Escanor'):
+        for i, pos in enumerate(Settings.Unit_Positions[unit]):
+            if f"{unit} {i}" in done:
+                continue
+            monarch_unit(pos)
+            done.append(f"{unit} {i}")
+            flow.save()
+
+def state_final_waves():
+    # Buys the last lanes at 139 (149) and repairs barricades untill wave 140 (150)
+    last_wave = 150 if Settings.WAVE_RESTART_150 else 140
+    finished = False
+    while not finished:
+        flow.check()
+        if waves.current() == last_wave-1 and not flow.data.get("lanes_bought"):
+            buy_rest_lanes()
+            flow.data["lanes_bought"] = True
+            flow.save()
+        wave = waves.current() # one cached read for the whole check, no inline OCR
+        if wave==last_wave:
+            finished = True
+        elif wave is not None:
+            if last_wave == 150 and (wave%2==0 or wave == 139):
+                repair_barricades()
+                quick_rts()
+            elif last_wave == 140 and (wave%2==0 or wave == 139 and flow.data.get("lanes_bought")):
+                repair_barricades()
+                quick_rts()
+        time.sleep(2)
+
+def state_end():
+    flow.data["runs"] = flow.data.get("runs", 0) + 1
+    num_runs = flow.data["runs"]
+    print(f"Run over, runs: {num_runs}")
+    print(f"Run {num_runs} {inp.summary()}")
+    inp.reset_stats()
+    try:
+            victory = wt.screen_shot_memory()
+            runtime = f"{datetime.now()-start_of_run}"
+        
+            g = Thread(target=webhook.send_webhook,
+                kwargs={
+
+                        "run_time": f"{str(runtime).split('.')[0]}",
+                        "num_runs": num_runs,
+                        "task_name": "Winter Event",
+                        "img": victory,
+                    },
+                )            
+            g.start()
+    except Exception as e:
+        print(f" error {e}")
+        
+        
+    ainz_pos = Settings.Unit_Positions['Ainz']
+    click(ainz_pos[0][0],ainz_pos[0][1],delay=0.2)
+    time.sleep(0.5)
+    inp.press('x')
+    time.sleep(0.5)
+    inp.press('f')
+    time.sleep(1)
+    sell_kaguya()
+    inp.press('f')
+
+def state_restart():
+    match_restarted = False
+    while not match_restarted:
+        flow.check()
+        avM.restart_match() 
+        waves.reset() # after the clicks, before that the old wave is still on screen and would get confirmed again
+        try:
+            wait.wait_for(lambda: waves.current() == 0, timeout=5.5, max_interval=0.5, name="wave 0")
+            match_restarted = True
+        except wait.WaitTimeout:
+            print("Match didn't restart, retrying")
+
+def match_running() -> bool:
+    # Entry check for everything after the match started, wave 0 means it got reset under us (None = can't tell)
+    return waves.current() != 0
+
+def match_states() -> list[sm.State]:
+    '''
+    The match flow, timeouts (seconds) can be changed per state with STATE_TIMEOUTS in the settings.
+    A state that keeps failing restarts the match instead of looping forever.
+    '''
+    timeouts = {
+        "start": 600, "mirko": 240, "mirko_3": 240, "speedwagon": 180, "tak": 300, "nami": 180,
+        "fortune": 600, "damage": 600, "monarch": 600, "wave_19": 900, "monarchs": 900, "upgrades": 900,
+        "gamble": 3600, "max_units": 3600, "final_waves": 10800, "end": 300, "restart": 300,
+    }
+    timeouts.update(getattr(Settings, "STATE_TIMEOUTS", {}) or {})
+    # Right after Start Match the counter can sit at 0 for a while (vote timer), so the early states wait longer
+    early = {"mirko_3", "speedwagon", "tak", "nami"}
+    order = [
+        ("start", state_start, None, 0),
+        ("mirko", state_mirko, None, 0),
+        ("mirko_3", state_mirko_3, match_running, 0),
+        ("speedwagon", state_speedwagon, match_running, 0),
+        ("tak", state_tak, match_running, 0),
+        ("nami", state_nami, match_running, 0),
+        ("fortune", state_fortune, match_running, 0),
+        ("damage", state_damage, match_running, 0),
+        ("monarch", state_monarch, match_running, 0),
+        ("wave_19", state_wave_19, match_running, 1),
+        ("monarchs", state_monarchs, match_running, 1),
+        ("upgrades", state_upgrades, match_running, 0),
+        ("gamble", state_gamble, match_running, 1),
+        ("max_units", state_max_units, match_running, 1),
+        ("final_waves", state_final_waves, match_running, 1),
+        ("end", state_end, None, 0),
+        ("restart", state_restart, None, 0),
+    ]
+    states = []
+    for i, (name, run, check, retries) in enumerate(order):
+        following = order[i + 1][0] if i + 1 < len(order) else "start"
+        states.append(sm.State(name, run, next=following, check=check, timeout=timeouts.get(name),
+                               retries=retries, on_fail="restart", entry_wait=60 if name in early else sm.ENTRY_WAIT))
+    return states
+
+def resumable() -> dict | None:
+    # The checkpoint to resume from if it's from the match that's still running, None = start a new match
+    saved = checkpoint.load()
+    if not saved or saved.get("state") in (None, "start", "mirko", "end", "restart"):
+        return None
+    age = time.time() - saved.get("saved", 0)
+    if age > getattr(Settings, "CHECKPOINT_MAX_AGE", 900):
+        print(f"Checkpoint at {saved['state']} is {age:.0f}s old, starting over")
+        return None
+    wave = avM.get_wave() or -1
+    if wave < max(saved.get("wave") or 1, 1): # counter went back, it's not the same match anymore
+        print(f"Checkpoint at {saved['state']} was wave {saved.get('wave')}, now {wave}, starting over")
+        return None
+    return saved
+
+def main(resume: dict | None = None):
+    global start_of_run
+    print("Starting Winter Event Macro")
+    start_of_run = datetime.now()
+    inp.reset_stats()
+    if resume is not None:
+        data = resume.get("data", {})
+        Settings.Unit_Placements_Left = data.setdefault("placements", match_placements())
+        print(f"Resuming at {resume['state']} (run {data.get('runs', 0) + 1})")
+        quick_rts() # where the player stands after a relaunch is anyone's guess
+        flow.run(resume["state"], data)
+    else:
+        flow.run("start", {"runs": 0})
 
 def disconnect_checker():
     time.sleep(60) # intial detect delay
+    feed = fp.subscribe() # frames come from the shared capture thread
     while True:
-       if bt.does_exist("Winter\\Disconnected.png",confidence=0.9,grayscale=True,region=(525,353,972,646)) or bt.does_exist("Winter\\Disconnect_Two.png",confidence=0.9,grayscale=True,region=(525,353,972,646)):
+       frame = feed.next(timeout=5)
+       if frame is None:
+           continue
+       if bt.does_exist("Winter\\Disconnected.png",confidence=0.9,grayscale=True,region=(525,353,972,646),frame=frame) or bt.does_exist("Winter\\Disconnect_Two.png",confidence=0.9,grayscale=True,region=(525,353,972,646),frame=frame):
         print("found disconnected")
         try:
             args = list(sys.argv)
@@ -1421,11 +1415,11 @@ def on_disconnect():
     except Exception as e:
         print(f"error when resize: {e}")
     while not bt.does_exist("Winter\\AreaIcon.png",confidence=0.8,grayscale=False):
-        if pyautogui.pixelMatchesColor(1085,321,(255,255,255),tolerance=5):  
+        if pt.check("rejoin_button"):  
             click(1083,321,delay=0.1)
         time.sleep(1)
     time.sleep(1)
-    if pyautogui.pixelMatchesColor(1085,321,(255,255,255),tolerance=5):  
+    if pt.check("rejoin_button"):  
             click(1083,321,delay=0.1)
     bt.click_image("Winter\\AreaIcon.png",confidence=0.8,grayscale=False,offset=(0,0))
     time.sleep(3)
@@ -1433,22 +1427,23 @@ def on_disconnect():
     def spam_e():
         #{(884, 266): (170, 232, 235)}
         while not open_menu:
-            keyboard.press_and_release('e')
+            inp.press('e')
             time.sleep(0.2)
     while not open_menu:
         click(656,764,delay=0.1)
         time.sleep(1)
-        keyboard.press('a')
+        inp.key_down('a')
         time.sleep(1)
-        keyboard.release('a')
+        inp.key_up('a')
         Thread(target=spam_e).start()
-        keyboard.press('a')
+        inp.key_down('a')
         time.sleep(1)
-        keyboard.release('a')
-        if pyautogui.pixelMatchesColor(888,269,(165, 232, 235),tolerance=30):
+        inp.key_up('a')
+        states = pt.evaluate(["menu_open", "rejoin_button"]) # both pixels from one grab
+        if states["menu_open"]:
             open_menu = True
         if not open_menu:
-            if pyautogui.pixelMatchesColor(1085,321,(255,255,255),tolerance=5):  
+            if states["rejoin_button"]:  
                 click(1083,321,delay=0.1)
             bt.click_image("Winter\\AreaIcon.png",confidence=0.8,grayscale=False,offset=(0,0))
         time.sleep(3)
@@ -1462,26 +1457,37 @@ def on_disconnect():
     wait_start()
     wait_start()
     wait_start()
-    keyboard.press('i')
+    inp.key_down('i')
     time.sleep(1)
-    keyboard.release('i')
-    ctypes.windll.user32.mouse_event(0x0001, 0, 1000, 0, 0)
-    keyboard.press('o')
+    inp.key_up('i')
+    inp.move_relative(0, 1000)
+    inp.key_down('o')
     time.sleep(1)
-    keyboard.release('o')      
+    inp.key_up('o')      
     click(488, 463,delay=0.2)
 
 if "--restart" in sys.argv:
     on_disconnect()
     
 
+fp.start(fps=getattr(Settings, "WATCHER_FPS", 2)) # one capture thread shared by the watchers
+waves = waveTracker.start(interval=getattr(Settings, "WAVE_INTERVAL", 0.5)) # reads the wave in the background
+economy = eco.Economy(lambda: avM.get_yen(getattr(Settings, "YEN_REGION", None)), getattr(Settings, "PRICES", {}))
+if getattr(Settings, "YEN_REGION", None):
+    waves.on_change(lambda *_: economy.sample()) # one yen reading per wave keeps the income rate current
+checkpoint = sm.Checkpoint(os.path.join(Settings_Path, "Match_Checkpoint.json")) # which state the match is in, survives relaunches
+flow = sm.StateMachine(match_states(), checkpoint, paused=lambda: not g_toggle, extra=lambda: {"wave": waves.current()},
+                       on_retry=lambda name: quick_rts()) # every retried state starts from spawn
+start_of_run = datetime.now()
 Thread(target=disconnect_checker).start()
 print(f"Launched with args {sys.argv}")
 print(f"Running loxer's winter macro v{VERSION_N}")
-if bt.does_exist("Winter\\Disconnected.png",confidence=0.9,grayscale=True,region=(525,353,972,646)) or  bt.does_exist("Winter\\Disconnect_Two.png",confidence=0.9,grayscale=True,region=(525,353,972,646)):
+startup_frame = bt.grab_frame() # one full grab for all the startup checks
+if bt.does_exist("Winter\\Disconnected.png",confidence=0.9,grayscale=True,region=(525,353,972,646),frame=startup_frame) or  bt.does_exist("Winter\\Disconnect_Two.png",confidence=0.9,grayscale=True,region=(525,353,972,646),frame=startup_frame):
     on_disconnect()
     time.sleep(6)
-if pyautogui.pixelMatchesColor(690,270,(242,25,28),tolerance=10) or pyautogui.pixelMatchesColor(690,270,(199, 45, 40),tolerance=5) or bt.does_exist("Winter\\DetectLoss.png",confidence=0.7,grayscale=True,region=(311, 295, 825, 428)):
+    startup_frame = bt.grab_frame()
+if pt.check("loss", startup_frame) or bt.does_exist("Winter\\DetectLoss.png",confidence=0.7,grayscale=True,region=(311, 295, 825, 428),frame=startup_frame):
     on_failure()
     time.sleep(6)
 Thread(target=detect_loss).start()
@@ -1508,25 +1514,27 @@ for z in range(3):
     print(f"Starting in {3-z}")
     time.sleep(1)
 if g_toggle:
-    if avM.get_wave() >= 1:
+    resume = resumable() # same match still running after a relaunch: carry on from the checkpoint
+    if resume is None and (avM.get_wave() or -1) >= 1:
         avM.restart_match()
     #release potential keys
-    keyboard.press_and_release('w')
-    keyboard.press_and_release('a')
-    keyboard.press_and_release('s')
-    keyboard.press_and_release('d')
-    main()
+    inp.press('w')
+    inp.press('a')
+    inp.press('s')
+    inp.press('d')
+    main(resume)
 else:
     while not g_toggle:
         time.sleep(1)
-    if avM.get_wave() >= 1:
+    resume = resumable() # same match still running after a relaunch: carry on from the checkpoint
+    if resume is None and (avM.get_wave() or -1) >= 1:
         avM.restart_match()
     #release potential keys
-    keyboard.press_and_release('w')
-    keyboard.press_and_release('a')
-    keyboard.press_and_release('s')
-    keyboard.press_and_release('d')
-    main()
+    inp.press('w')
+    inp.press('a')
+    inp.press('s')
+    inp.press('d')
+    main(resume)
 
 
 